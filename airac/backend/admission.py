@@ -0,0 +1,65 @@
+import asyncio
+from metrics import counter
+
+REQUESTS_SHED = counter(
+    "airac_requests_shed_total", "Requests rejected by admission control.", ["reason"]
+)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    At most `max_concurrent` requests run at once and up to `max_queued` more
+    wait for a slot, each for at most `queue_timeout` seconds. Anything beyond
+    that is rejected at once with Overloaded, so excess load is shed quickly
+    instead of piling up behind slow upstreams.
+    """
+
+    def __init__(self, max_concurrent: int = 64, max_queued: int = 128, queue_timeout: float = 5.0,
+                 retry_after: int = 1):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.slots = asyncio.Semaphore(max_concurrent)
+        self.running = 0
+        self.waiting = 0
+        self.shed = 0
+
+    def _reject(self, reason: str):
+        self.shed += 1
+        REQUESTS_SHED.inc(reason=reason)
+        return Overloaded(reason, self.retry_after)
+
+    def full(self) -> bool:
+        return self.running >= self.max_concurrent and self.waiting >= self.max_queued
+
+    async def acquire(self, timeout: float = None):
+        if self.full():
+            raise self._reject("queue_full")
+
+        if not self.slots.locked():
+            await self.slots.acquire()
+        else:
+            timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.slots.acquire(), max(timeout, 0.0))
+            except TimeoutError:
+                raise self._reject("queue_timeout") from None
+            finally:
+                self.waiting -= 1
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self.slots.release()
+
+    def stats(self):
+        return {"running": self.running, "waiting": self.waiting, "shed": self.shed}
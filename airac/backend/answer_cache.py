@@ -0,0 +1,92 @@
+import hashlib
+import threading
+from cachetools import TTLCache
+from embeddings import normalize_query
+from metrics import counter
+
+ANSWER_CACHE_REQUESTS = counter(
+    "airac_answer_cache_requests_total", "Exact-match answer cache lookups.", ["result"]
+)
+
+
+class AnswerCache:
+    """
+    Exact-match (L1) answer cache keyed by a hash of the normalized query.
+    With a SharedCache, answers written by any worker on the host are found
+    there on a local miss.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600, shared=None):
+        # TTLCache expires entries after `ttl` seconds and evicts the least
+        # recently used entry once `max_size` is reached
+        self.entries = TTLCache(maxsize=max_size, ttl=ttl)
+        self.lock = threading.Lock()
+        self.ttl = ttl
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(query: str) -> str:
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+    def _local(self, key: str):
+        with self.lock:
+            return self.entries.get(key)
+
+    def _counted(self, key: str, answer, shared: bool):
+        # Answers found in the shared cache are kept locally too
+        with self.lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if shared:
+                    self.entries[key] = answer
+        ANSWER_CACHE_REQUESTS.inc(result="miss" if answer is None else "hit")
+        return answer
+
+    def get(self, query: str):
+        key = self.key(query)
+        answer = self._local(key)
+        if answer is not None or self.shared is None:
+            return self._counted(key, answer, False)
+        return self._counted(key, self.shared.get("answer", key), True)
+
+    async def aget(self, query: str):
+        key = self.key(query)
+        answer = self._local(key)
+        if answer is not None or self.shared is None:
+            return self._counted(key, answer, False)
+        return self._counted(key, await self.shared.aget("answer", key), True)
+
+    def contains(self, query: str) -> bool:
+        # Peek without counting a hit or miss
+        key = self.key(query)
+        if self._local(key) is not None:
+            return True
+        return self.shared is not None and self.shared.contains("answer", key)
+
+    async def acontains(self, query: str) -> bool:
+        key = self.key(query)
+        if self._local(key) is not None:
+            return True
+        return self.shared is not None and await self.shared.acontains("answer", key)
+
+    def put(self, query: str, answer: str):
+        key = self.key(query)
+        with self.lock:
+            self.entries[key] = answer
+        if self.shared is not None:
+            self.shared.add("answer", key, answer, self.ttl)
+
+    async def aput(self, query: str, answer: str):
+        key = self.key(query)
+        with self.lock:
+            self.entries[key] = answer
+        if self.shared is not None:
+            await self.shared.aadd("answer", key, answer, self.ttl)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
@@ -1,14 +1,78 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from backend.retrieval_pipeline import Badal
+from typing import Optional
+# Same flat import as the pipeline modules, so both share one registry
+from metrics import REGISTRY, counter, histogram, request_timings, server_timing
+from deadline import DeadlineExceeded, remaining, request_deadline
+from admission import AdmissionController, Overloaded
+import asyncio
 import logging
+import json
+import time
+import os
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AIRAC API", version="1.0.0")
+REQUESTS = counter("airac_requests_total", "Answered requests by endpoint and cache tier.", ["endpoint", "cache_tier"])
+REQUEST_SECONDS = histogram("airac_request_duration_seconds", "End-to-end request latency.", ["endpoint"])
+TIMED_OUT = counter("airac_requests_timed_out_total", "Requests that ran past their deadline.", ["endpoint"])
+
+# Every query must be answered within REQUEST_TIMEOUT seconds, queueing
+# included; each pipeline stage gets what is left as its timeout
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30"))
+# Beyond MAX_CONCURRENT_REQUESTS running and MAX_QUEUED_REQUESTS waiting,
+# queries are turned away with 503 and Retry-After
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_REQUESTS", "64")),
+    max_queued=int(os.getenv("MAX_QUEUED_REQUESTS", "128")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")),
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+)
+
+# The RAG pipeline is built in the background once the server is up, so the
+# port opens without waiting for it; /ready reports when it can take queries
+badal_pipeline = None
+init_error = None
+INIT_RETRY_BASE = float(os.getenv("PIPELINE_INIT_RETRY_BASE", "1"))
+INIT_RETRY_CAP = float(os.getenv("PIPELINE_INIT_RETRY_CAP", "60"))
+
+def build_pipeline():
+    # Imported here: langchain/langgraph take most of the startup time
+    from backend.retrieval_pipeline import Badal
+    return Badal()
+
+async def initialize_pipeline():
+    global badal_pipeline, init_error
+    delay = INIT_RETRY_BASE
+    while badal_pipeline is None:
+        start = time.perf_counter()
+        try:
+            badal_pipeline = await asyncio.to_thread(build_pipeline)
+            init_error = None
+            logger.info(f"RAG pipeline initialized successfully in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            init_error = str(e)
+            logger.error(f"Failed to initialize RAG pipeline: {e} (retrying in {delay:.1f}s)")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, INIT_RETRY_CAP)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_task = asyncio.create_task(initialize_pipeline()) if badal_pipeline is None else None
+    yield
+    if init_task is not None:
+        init_task.cancel()
+    # Flush queued cache writes and release pooled async HTTP/Pinecone
+    # connections on shutdown
+    if badal_pipeline is not None:
+        await badal_pipeline.aclose()
+
+app = FastAPI(title="AIRAC API", version="1.0.0", lifespan=lifespan)
 
 # Enable CORS for React frontend (updated for Vite)
 app.add_middleware(
@@ -27,14 +91,33 @@ class QueryRequest(BaseModel):
 
 class QueryResponse(BaseModel):
     response: str
+    # Which tier served the answer: exact_answer, table_answer,
+    # semantic_answer, semantic_context or retrieval
+    cache_tier: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: list[str]
+    # Send each result as a JSON line as soon as it is ready
+    stream: bool = False
+
+class BatchQueryResponse(BaseModel):
+    results: list[QueryResponse]
+
+ERROR_MESSAGE = (
+    "I encountered an issue processing your query. "
+    "This could be due to connectivity issues with the knowledge base or AI service. "
+    "Please try again in a moment."
+)
+TIMEOUT_MESSAGE = "The query took too long to answer. Please try again in a moment."
+BUSY_MESSAGE = "The server is busy. Please try again in a moment."
 
-# Initialize the RAG pipeline once when the server starts
-try:
-    badal_pipeline = Badal()
-    logger.info("RAG pipeline initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize RAG pipeline: {e}")
-    badal_pipeline = None
+def overloaded(e: Overloaded) -> HTTPException:
+    logger.warning(f"Shedding request: {e}")
+    return HTTPException(
+        status_code=503,
+        detail=BUSY_MESSAGE,
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
 @app.get("/")
 async def root():
@@ -42,15 +125,48 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    pipeline_status = "operational" if badal_pipeline else "failed"
+    # Liveness: the process is up, whether or not the pipeline is ready yet
+    if badal_pipeline is not None:
+        pipeline_status = "operational"
+    else:
+        pipeline_status = "failed" if init_error else "initializing"
     return {
         "status": "healthy", 
         "message": "API is operational",
         "rag_pipeline": pipeline_status
     }
 
+@app.get("/ready")
+async def readiness_check():
+    # Readiness: only route traffic here once the pipeline can answer
+    if badal_pipeline is None:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "not ready", "error": init_error}
+        )
+    return {"status": "ready"}
+
+@app.get("/stats")
+async def stats():
+    if badal_pipeline is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG pipeline is not available. Please check server logs."
+        )
+    return {**badal_pipeline.stats(), "admission": admission.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest):
+async def query_endpoint(request: QueryRequest, response: Response):
+    start = time.perf_counter()
+    timings = []
+    request_timings.set(timings)
+    request_deadline.set(time.monotonic() + REQUEST_TIMEOUT)
+    admitted = False
     try:
         # Check if RAG pipeline is available
         if badal_pipeline is None:
@@ -66,24 +182,165 @@ async def query_endpoint(request: QueryRequest):
                 detail="Query cannot be empty"
             )
         
+        # Waits for a slot only as long as the deadline allows
+        await admission.acquire(remaining())
+        admitted = True
         logger.info(f"Processing query: {request.query}")
         
-        # Use your existing RAG pipeline
-        ai_response = badal_pipeline.invoke(request.query.strip())
+        # Run the RAG pipeline without blocking the event loop
+        result = await badal_pipeline.arun(request.query.strip())
+
+        # Per-stage durations for the frontend (browser devtools show them too)
+        elapsed = time.perf_counter() - start
+        response.headers["Server-Timing"] = server_timing(timings + [("total", elapsed)])
+        response.headers["Timing-Allow-Origin"] = "*"
+        REQUESTS.inc(endpoint="query", cache_tier=result["cache_tier"])
+        REQUEST_SECONDS.observe(elapsed, endpoint="query")
         
-        logger.info("Query processed successfully")
-        return QueryResponse(response=ai_response)
+        logger.info(
+            f"Query processed successfully (cache tier: {result['cache_tier']}, "
+            f"prompt tokens: {result.get('prompt_tokens_full')} -> {result.get('prompt_tokens')})"
+        )
+        return QueryResponse(response=result["answer"], cache_tier=result["cache_tier"])
         
     except HTTPException:
         # Re-raise HTTP exceptions as-is
         raise
+    except Overloaded as e:
+        raise overloaded(e)
+    except DeadlineExceeded as e:
+        logger.error(f"Timed out processing query '{request.query}': {str(e)}")
+        TIMED_OUT.inc(endpoint="query")
+        raise HTTPException(status_code=504, detail=TIMEOUT_MESSAGE)
     except Exception as e:
         logger.error(f"Error processing query '{request.query}': {str(e)}")
-        
-        # Return a user-friendly error message
-        error_message = (
-            "I encountered an issue processing your query. "
-            "This could be due to connectivity issues with the knowledge base or AI service. "
-            "Please try again in a moment."
+        REQUESTS.inc(endpoint="query", cache_tier="error")
+        # A failure is not an answer; clients and monitoring see the status
+        raise HTTPException(status_code=500, detail=ERROR_MESSAGE)
+    finally:
+        if admitted:
+            admission.release()
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
+    if badal_pipeline is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG pipeline is not available. Please check server logs."
+        )
+
+    if not request.query or not request.query.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Query cannot be empty"
+        )
+
+    # Shed before the stream starts; the slot itself is taken inside the
+    # generator so it is always released with it
+    if admission.full():
+        raise overloaded(Overloaded("queue_full", admission.retry_after))
+
+    query = request.query.strip()
+    logger.info(f"Streaming query: {query}")
+
+    async def events():
+        request_deadline.set(time.monotonic() + REQUEST_TIMEOUT)
+        admitted = False
+        try:
+            await admission.acquire(remaining())
+            admitted = True
+            async for event in badal_pipeline.astream(query):
+                if event["type"] == "token":
+                    yield sse_event("token", {"content": event["content"]})
+                else:
+                    REQUESTS.inc(endpoint="query_stream", cache_tier=event["cache_tier"])
+                    REQUEST_SECONDS.observe(event["total_ms"] / 1000, endpoint="query_stream")
+                    logger.info(
+                        f"Query streamed successfully (cache tier: {event['cache_tier']}, "
+                        f"prompt tokens: {event['prompt_tokens_full']} -> {event['prompt_tokens']}, "
+                        f"ttft: {event['ttft_ms']} ms, total: {event['total_ms']} ms)"
+                    )
+                    yield sse_event("done", event)
+        except Overloaded as e:
+            logger.warning(f"Shedding request: {e}")
+            yield sse_event("error", {"message": BUSY_MESSAGE})
+        except DeadlineExceeded as e:
+            logger.error(f"Timed out streaming query '{query}': {str(e)}")
+            TIMED_OUT.inc(endpoint="query_stream")
+            yield sse_event("error", {"message": TIMEOUT_MESSAGE})
+        except Exception as e:
+            logger.error(f"Error streaming query '{query}': {str(e)}")
+            REQUESTS.inc(endpoint="query_stream", cache_tier="error")
+            yield sse_event("error", {"message": ERROR_MESSAGE})
+        finally:
+            if admitted:
+                admission.release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch_endpoint(request: BatchQueryRequest):
+    # Bulk evaluation and cache warm-up: every query goes through the normal
+    # pipeline, so the answers are cached for later /query calls
+    if badal_pipeline is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG pipeline is not available. Please check server logs."
         )
-        return QueryResponse(response=error_message)
\ No newline at end of file
+
+    queries = [query.strip() for query in request.queries]
+    if not queries or not all(queries):
+        raise HTTPException(
+            status_code=400,
+            detail="Queries cannot be empty"
+        )
+    if len(queries) > badal_pipeline.batch_query_max:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {badal_pipeline.batch_query_max} queries per batch"
+        )
+
+    # A batch takes one admission slot and has no overall deadline
+    if admission.full():
+        raise overloaded(Overloaded("queue_full", admission.retry_after))
+
+    logger.info(f"Processing batch of {len(queries)} queries")
+
+    async def results():
+        start = time.perf_counter()
+        await admission.acquire()
+        try:
+            async for result in badal_pipeline.abatch(queries):
+                if "error" in result:
+                    logger.error(f"Error processing query '{result['query']}': {str(result['error'])}")
+                    REQUESTS.inc(endpoint="query_batch", cache_tier="error")
+                    yield QueryResponse(response=ERROR_MESSAGE)
+                else:
+                    REQUESTS.inc(endpoint="query_batch", cache_tier=result["cache_tier"])
+                    yield QueryResponse(response=result["answer"], cache_tier=result["cache_tier"])
+        finally:
+            admission.release()
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="query_batch")
+
+    if request.stream:
+        async def lines():
+            try:
+                async for result in results():
+                    yield result.model_dump_json() + "\n"
+            except Overloaded as e:
+                logger.warning(f"Shedding request: {e}")
+                yield json.dumps({"error": BUSY_MESSAGE}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    try:
+        return BatchQueryResponse(results=[result async for result in results()])
+    except Overloaded as e:
+        raise overloaded(e)
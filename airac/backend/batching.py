@@ -0,0 +1,141 @@
+import asyncio
+from deadline import request_deadline
+from metrics import request_timings
+
+
+class MicroBatcher:
+    """
+    Coalesces items submitted concurrently on one event loop into a single
+    call of `handler(items) -> results`. A batch is sent once it holds
+    max_batch_size items or max_wait_ms after its first item arrived,
+    whichever comes first, and each caller gets its own result back.
+    """
+
+    def __init__(self, handler, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending = []
+        self.timer = None
+        # Strong references so in-flight batches are not garbage collected
+        self.tasks = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+
+        if len(self.pending) >= self.max_batch_size:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        # Callers cancelled while waiting, such as an index search beaten by a
+        # cache hit, are not sent upstream
+        batch = [(item, future) for item, future in self.pending if not future.done()]
+        self.pending = []
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+
+        task = asyncio.ensure_future(self._run(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch):
+        # A batch serves several requests, so it is neither held to the
+        # deadline of the one that happened to flush it nor charged to its
+        # timings; each caller enforces its own deadline
+        request_deadline.set(None)
+        request_timings.set(None)
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except Exception as e:
+            # Every caller in the batch sees the upstream failure
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # A caller may have been cancelled while the batch was in flight
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0
+        }
+
+
+class BatchingEmbedder:
+    """
+    Async front for an embedder: concurrent aembed() calls share one upstream
+    request. Sync calls go straight through.
+    """
+
+    def __init__(self, embedder, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedder = embedder
+        self.batcher = MicroBatcher(embedder.aembed_queries, max_batch_size, max_wait_ms)
+
+    def embed(self, text: str) -> list[float]:
+        return self.embedder.embed(text)
+
+    async def aembed(self, text: str) -> list[float]:
+        return await self.batcher.submit(text)
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        # Already one request; no need to wait for a batch
+        return await self.embedder.aembed_queries(texts)
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        return self.embedder.embed_batch(texts)
+
+    def stats(self):
+        return {**self.embedder.stats(), **self.batcher.stats()}
+
+    async def aclose(self):
+        await self.embedder.aclose()
+
+
+class BatchingRetriever:
+    """
+    Async front for a dense retriever: concurrent aget() calls are answered by
+    one asearch_batch() over all of their query vectors.
+    """
+
+    def __init__(self, retriever, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.retriever = retriever
+        self.embedder = retriever.embedder
+        self.batcher = MicroBatcher(self._search, max_batch_size, max_wait_ms)
+
+    async def _search(self, items):
+        # One search at the largest requested top_k, trimmed per caller
+        top_k = max(k for _, k in items)
+        results = await self.retriever.asearch_batch([emb for emb, _ in items], top_k)
+        return [{"matches": result["matches"][:k]} for result, (_, k) in zip(results, items)]
+
+    def get(self, query, query_embedding=None, top_k=1):
+        return self.retriever.get(query, query_embedding, top_k=top_k)
+
+    async def aget(self, query, query_embedding=None, top_k=1):
+        if query_embedding is None:
+            query_embedding = await self.embedder.aembed(query)
+        return await self.batcher.submit((query_embedding, top_k))
+
+    def stats(self):
+        return self.batcher.stats()
+
+    async def aclose(self):
+        await self.retriever.aclose()
@@ -1,81 +1,119 @@
 from dotenv import load_dotenv
 import os
-import requests
 import json
 from langchain_core.documents import Document
-from pinecone import Pinecone as PineconeClient, ServerlessSpec
+from embeddings import JinaEmbeddings
+from cache_store import PineconeCacheStore, LocalCacheStore
+from metrics import counter, span
+
+SEMANTIC_CACHE_REQUESTS = counter(
+    "airac_semantic_cache_requests_total", "Semantic cache lookups.", ["result"]
+)
 
 class Cache:
-    def __init__(self):
+    def __init__(self, embedder=None, store=None):
         load_dotenv()
-        self.JINA_API_KEY = os.getenv("JINA_API_KEY")
-        pinecone_api_key = os.getenv("PINECONE_API_KEY")
-        self.index_name = "semantic-cache-jina-api"
+        self.embedder = embedder or JinaEmbeddings()
         self.dimension = 1024
+        self.threshold = float(os.getenv("CACHE_THRESHOLD", "0.95"))
+        self.store = store if store is not None else self.build_store()
 
-        self.pinecone = PineconeClient(api_key=pinecone_api_key)
-
-        if self.index_name not in self.pinecone.list_indexes().names():
-            print(f"Creating a new cache index named '{self.index_name}' with {self.dimension} dimensions...")
-            self.pinecone.create_index(
-                name=self.index_name,
+    def build_store(self):
+        # CACHE_BACKEND=local keeps the semantic cache in process
+        backend = os.getenv("CACHE_BACKEND", "pinecone").lower()
+        if backend == "local":
+            return LocalCacheStore(
                 dimension=self.dimension,
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+                capacity=int(os.getenv("CACHE_CAPACITY", "10000")),
+                eviction=os.getenv("CACHE_EVICTION", "lru").lower(),
+                snapshot_path=os.getenv("CACHE_SNAPSHOT_PATH", "cache_db/semantic_cache.npz"),
+                snapshot_interval=float(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
             )
+        if backend == "pinecone":
+            return PineconeCacheStore(
+                api_key=os.getenv("PINECONE_API_KEY"),
+                index_name=os.getenv("PINECONE_CACHE_INDEX_NAME", "semantic-cache-jina-api"),
+                dimension=self.dimension,
+                host=os.getenv("PINECONE_CACHE_HOST")
+            )
+        raise ValueError(f"❌ Unknown CACHE_BACKEND '{backend}' (expected 'pinecone' or 'local').")
 
-        self.index = self.pinecone.Index(self.index_name)
+    def _parse_match(self, query: str, top_match):
+        if top_match is None or top_match['score'] < self.threshold:
+            SEMANTIC_CACHE_REQUESTS.inc(result="miss")
+            return None
 
-    def _get_jina_embedding(self, text: str) -> list[float]:
-        url = "https://api.jina.ai/v1/embeddings"
-        headers = {
-            "Authorization": f"Bearer {self.JINA_API_KEY}",
-            "Content-Type": "application/json",
+        SEMANTIC_CACHE_REQUESTS.inc(result="hit")
+        parent_ids = top_match["metadata"].get("parent_ids")
+        if parent_ids is None and top_match["metadata"].get("parent_id"):
+            parent_ids = [top_match["metadata"]["parent_id"]]
+        metadata = {
+            "parent_ids": parent_ids or [],
+            "answer": top_match["metadata"].get("answer"),
+            "score": top_match["score"]
         }
-        payload = {"model": "jina-embeddings-v3", "input": text, "task": "retrieval.passage"}
+        # Entries written before the parent store carried the parent inline
+        if "parent_text" in top_match["metadata"]:
+            metadata["parent_text"] = top_match["metadata"]["parent_text"]
+            metadata["parent_tables"] = json.loads(top_match["metadata"].get("parent_tables", "[]"))
+        return [Document(page_content=query, metadata=metadata)]
 
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code != 200:
-            raise Exception(f"Jina API Error in Cache: {response.text}")
+    def _metadata(self, parent_ids: list[str], answer: str = None):
+        metadata = {"parent_ids": parent_ids}
+        if answer is not None:
+            metadata["answer"] = answer
+        return metadata
 
-        return response.json()["data"][0]["embedding"]
-
-    def get(self, query: str):
+    def get(self, query: str, query_embedding: list[float] = None):
         try:
-            query_embedding = self._get_jina_embedding(query)
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=1,
-                include_metadata=True
-            )
-            matches = results.get("matches", [])
-            if not matches:
-                return None
-
-            top_match = matches[0]
-            if top_match['score'] >= 0.95:
-                metadata = {
-                    "parent_text": top_match["metadata"].get("parent_text", ""),
-                    "parent_tables": json.loads(top_match["metadata"].get("parent_tables", "[]"))
-                }
-                return [Document(page_content=query, metadata=metadata)]
-
+            if query_embedding is None:
+                query_embedding = self.embedder.embed(query)
+            with span("cache.query"):
+                top_match = self.store.query(query_embedding, self.threshold)
+            return self._parse_match(query, top_match)
+        except Exception as e:
+            print(f"An error occurred during cache retrieval: {e}")
             return None
+
+    async def aget(self, query: str, query_embedding: list[float] = None):
+        try:
+            if query_embedding is None:
+                query_embedding = await self.embedder.aembed(query)
+            with span("cache.query"):
+                top_match = await self.store.aquery(query_embedding, self.threshold)
+            return self._parse_match(query, top_match)
         except Exception as e:
             print(f"An error occurred during cache retrieval: {e}")
             return None
 
-    def add(self, query: str, parent_text: str, parent_tables: list):
+    def add(self, query: str, parent_ids: list[str], query_embedding: list[float] = None, answer: str = None):
         try:
-            query_embedding = self._get_jina_embedding(query)
-            metadata = {
-                "parent_text": parent_text,
-                "parent_tables": json.dumps(parent_tables)
-            }
-            self.index.upsert(vectors=[{
-                "id": query,
-                "values": query_embedding,
-                "metadata": metadata
-            }])
+            if query_embedding is None:
+                query_embedding = self.embedder.embed(query)
+            with span("cache.upsert"):
+                self.store.upsert(query, query_embedding, self._metadata(parent_ids, answer))
         except Exception as e:
             print(f"An error occurred during cache add: {e}")
+
+    async def aadd(self, query: str, parent_ids: list[str], query_embedding: list[float] = None, answer: str = None):
+        try:
+            if query_embedding is None:
+                query_embedding = await self.embedder.aembed(query)
+            with span("cache.upsert"):
+                await self.store.aupsert(query, query_embedding, self._metadata(parent_ids, answer))
+        except Exception as e:
+            print(f"An error occurred during cache add: {e}")
+
+    async def aadd_batch(self, entries: list[dict]):
+        # entries hold aadd()'s arguments; one store write for the whole batch
+        items = []
+        for entry in entries:
+            query_embedding = entry.get("query_embedding")
+            if query_embedding is None:
+                query_embedding = await self.embedder.aembed(entry["query"])
+            items.append((entry["query"], query_embedding, self._metadata(entry["parent_ids"], entry.get("answer"))))
+        with span("cache.upsert"):
+            await self.store.aupsert_batch(items)
+
+    async def aclose(self):
+        await self.store.aclose()
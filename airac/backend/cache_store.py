@@ -0,0 +1,249 @@
+import os
+import json
+import threading
+import numpy as np
+
+
+# -------------------------------
+# Remote store (Pinecone index)
+# -------------------------------
+class PineconeCacheStore:
+    def __init__(self, api_key: str, index_name: str = "semantic-cache-jina-api", dimension: int = 1024,
+                 host: str = None):
+        # Imported here so the local backend never loads the Pinecone client
+        from pinecone import Pinecone as PineconeClient
+
+        self.index_name = index_name
+        self.dimension = dimension
+
+        self.pinecone = PineconeClient(api_key=api_key)
+
+        # The index is provisioned by embedding_pinecone.py, not on startup
+        self.host = host or self.pinecone.describe_index(self.index_name).host
+        self.index = self.pinecone.Index(host=self.host)
+
+        self.async_index = None
+
+    def _get_async_index(self):
+        # Created lazily so it binds to the running event loop
+        if self.async_index is None:
+            self.async_index = self.pinecone.IndexAsyncio(host=self.host)
+        return self.async_index
+
+    def _top_match(self, results):
+        matches = results.get("matches", [])
+        if not matches:
+            return None
+        return {"id": matches[0]["id"], "score": matches[0]["score"], "metadata": matches[0]["metadata"]}
+
+    def query(self, vector, min_score: float = 0.0):
+        return self._top_match(self.index.query(vector=vector, top_k=1, include_metadata=True))
+
+    async def aquery(self, vector, min_score: float = 0.0):
+        return self._top_match(await self._get_async_index().query(vector=vector, top_k=1, include_metadata=True))
+
+    def upsert(self, key: str, vector, metadata: dict):
+        self.index.upsert(vectors=[{"id": key, "values": vector, "metadata": metadata}])
+
+    async def aupsert(self, key: str, vector, metadata: dict):
+        await self._get_async_index().upsert(vectors=[{"id": key, "values": vector, "metadata": metadata}])
+
+    async def aupsert_batch(self, items):
+        # items: (key, vector, metadata) tuples, written in one request
+        await self._get_async_index().upsert(
+            vectors=[{"id": key, "values": vector, "metadata": metadata} for key, vector, metadata in items]
+        )
+
+    async def aclose(self):
+        if self.async_index is not None:
+            await self.async_index.close()
+            self.async_index = None
+
+
+# -------------------------------
+# In-process store (NumPy matrix)
+# -------------------------------
+class LocalCacheStore:
+    """
+    Fixed-capacity semantic cache held in a preallocated embedding matrix.
+
+    Slots are reused in place once the store is full, choosing the victim by
+    least-recent use ("lru") or lowest hit count ("lfu"). Lookups scan a
+    contiguous block of the first `coarse_dims` components of every row
+    (Jina v3 embeddings are Matryoshka-trained, so the prefix preserves
+    near-duplicates) and rescore the best candidates on the full vectors.
+    """
+
+    def __init__(self, dimension: int = 1024, capacity: int = 10000, eviction: str = "lru",
+                 coarse_dims: int = 32, candidates: int = 32, snapshot_path: str = None,
+                 snapshot_interval: float = 300):
+        if eviction not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy '{eviction}' (expected 'lru' or 'lfu').")
+
+        self.dimension = dimension
+        self.capacity = capacity
+        self.eviction = eviction
+        self.coarse_dims = min(coarse_dims, dimension)
+        self.candidates = candidates
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.coarse = np.zeros((capacity, self.coarse_dims), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.hit_counts = np.zeros(capacity, dtype=np.int64)
+        self.keys = [None] * capacity
+        self.metadata = [None] * capacity
+        self.slots = {}
+        self.used = 0
+        self.clock = 0
+
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.stop_event = threading.Event()
+        self.snapshot_thread = None
+
+        if snapshot_path:
+            self.load_snapshot()
+            if snapshot_interval > 0:
+                self.snapshot_thread = threading.Thread(target=self._snapshot_loop, daemon=True)
+                self.snapshot_thread.start()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _tick(self):
+        self.clock += 1
+        return self.clock
+
+    def query(self, vector, min_score: float = 0.0):
+        query = self._normalize(vector)
+        with self.lock:
+            if self.used == 0:
+                return None
+
+            if self.used > self.candidates and self.coarse_dims < self.dimension:
+                coarse_query = self._normalize(query[:self.coarse_dims])
+                coarse_scores = self.coarse[:self.used] @ coarse_query
+                candidates = np.argpartition(coarse_scores, -self.candidates)[-self.candidates:]
+                scores = self.vectors[candidates] @ query
+                slot = int(candidates[np.argmax(scores)])
+                score = float(scores.max())
+            else:
+                scores = self.vectors[:self.used] @ query
+                slot = int(np.argmax(scores))
+                score = float(scores[slot])
+
+            # Only real hits count towards recency and frequency
+            if score >= min_score:
+                self.last_used[slot] = self._tick()
+                self.hit_counts[slot] += 1
+            return {"id": self.keys[slot], "score": score, "metadata": self.metadata[slot]}
+
+    async def aquery(self, vector, min_score: float = 0.0):
+        return self.query(vector, min_score)
+
+    def _victim(self):
+        if self.eviction == "lfu":
+            # Fewest hits first, oldest use breaks ties
+            order = np.lexsort((self.last_used, self.hit_counts))
+            return int(order[0])
+        return int(np.argmin(self.last_used))
+
+    def upsert(self, key: str, vector, metadata: dict):
+        vector = self._normalize(vector)
+        with self.lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                if self.used < self.capacity:
+                    slot = self.used
+                    self.used += 1
+                else:
+                    slot = self._victim()
+                    del self.slots[self.keys[slot]]
+                self.slots[key] = slot
+                self.hit_counts[slot] = 0
+
+            self.vectors[slot] = vector
+            self.coarse[slot] = self._normalize(vector[:self.coarse_dims])
+            self.keys[slot] = key
+            self.metadata[slot] = metadata
+            self.last_used[slot] = self._tick()
+            self.dirty = True
+
+    async def aupsert(self, key: str, vector, metadata: dict):
+        self.upsert(key, vector, metadata)
+
+    async def aupsert_batch(self, items):
+        for key, vector, metadata in items:
+            self.upsert(key, vector, metadata)
+
+    def __len__(self):
+        return self.used
+
+    # -------------------------------
+    # Snapshots for warm restarts
+    # -------------------------------
+    def snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            vectors = self.vectors[:self.used].copy()
+            hit_counts = self.hit_counts[:self.used].copy()
+            keys = self.keys[:self.used]
+            metadata = self.metadata[:self.used]
+            order = np.argsort(self.last_used[:self.used])
+            self.dirty = False
+
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp.npz"
+        # Rows are saved oldest-first so recency survives the restart
+        np.savez(
+            tmp_path,
+            vectors=vectors[order],
+            hit_counts=hit_counts[order],
+            entries=np.array(json.dumps([[keys[i], metadata[i]] for i in order])),
+        )
+        os.replace(tmp_path, self.snapshot_path)
+
+    def load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with np.load(self.snapshot_path) as data:
+                vectors = data["vectors"]
+                hit_counts = data["hit_counts"]
+                entries = json.loads(str(data["entries"]))
+        except Exception as e:
+            print(f"Could not load cache snapshot '{self.snapshot_path}': {e}")
+            return
+
+        if vectors.shape[1] != self.dimension:
+            print(f"Ignoring cache snapshot with dimension {vectors.shape[1]} (expected {self.dimension}).")
+            return
+
+        # Keep the most recently used rows if the capacity shrank
+        start = max(0, len(entries) - self.capacity)
+        for row, (key, metadata) in enumerate(entries[start:], start=start):
+            self.upsert(key, vectors[row], metadata)
+            self.hit_counts[self.slots[key]] = hit_counts[row]
+        self.dirty = False
+
+    def _snapshot_loop(self):
+        while not self.stop_event.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"An error occurred during cache snapshot: {e}")
+
+    def close(self):
+        self.stop_event.set()
+        self.snapshot()
+
+    async def aclose(self):
+        self.close()
@@ -1,53 +1,165 @@
-from langchain_community.document_loaders import JSONLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+from jsonl import read_jsonl
+import argparse
+import hashlib
 import json
-import uuid
+import os
+import time
 
-with open("scraped_data_final.json", "r", encoding="utf-8") as f:
-    parents = json.load(f)
+WORKERS = os.cpu_count() or 1
+BATCH_SIZE = 16
 
-for parent in parents:
-    parent["parent_id"] = str(uuid.uuid4())
 
-with open("scraped_data_final.json", "w", encoding="utf-8") as f:
-    json.dump(parents, f, indent=2, ensure_ascii=False)
+def content_hash(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()[:32]
 
 
-with open("scraped_data_final.json", "r", encoding="utf-8") as f:
-    parents = list(json.load(f))
+def parent_id_for(parent) -> str:
+    # Keyed by the page source and title, so an edited page keeps its ID and
+    # only its changed chunks get new ones. Sources alone are not unique:
+    # several pages come from "Website"
+    return content_hash("parent", parent["source"], parent.get("title", ""))
 
-children = []
-text_splitter = RecursiveCharacterTextSplitter(separators=["\n","."],chunk_size=80,chunk_overlap=20)
 
+def child_id_for(parent_id, chunk_type, text, occurrence) -> str:
+    # `occurrence` separates identical chunks within the same parent
+    return content_hash("child", parent_id, chunk_type, text, occurrence)
 
-for parent in parents:
+
+def chunk_parent(parent, text_splitter):
     title = parent["title"]
+    seen = {}
+
+    def make_child(chunk_type, text, original_data):
+        occurrence = seen.get((chunk_type, text), 0)
+        seen[(chunk_type, text)] = occurrence + 1
+        return {
+            "child_id": child_id_for(parent["parent_id"], chunk_type, text, occurrence),
+            "parent_id": parent["parent_id"],
+            "parent_source": parent["source"],
+            "parent_title": parent["title"],
+            "chunk_type": chunk_type,
+            "text": text,
+            "original_data": original_data
+        }
+
     if parent["text"] != "":
-        text_chunks = text_splitter.split_text(parent["text"])
-        for chunk in text_chunks:
-            children.append({
-                "child_id": str(uuid.uuid4()),
-                "parent_id": parent["parent_id"],
-                "parent_source":parent["source"],
-                "parent_title":parent["title"],
-                "chunk_type":"text_chunk",
-                "text":f"{title} | {chunk}",
-                "original_data": chunk
-            })
-    if parent["tables"] !=[]:
+        for chunk in text_splitter.split_text(parent["text"]):
+            yield make_child("text_chunk", f"{title} | {chunk}", chunk)
+    if parent["tables"] != []:
         for row in parent["tables"]:
             text = ";".join([f'"{key}"="{value}"' for key, value in row.items()])
-            children.append({
-                "child_id": str(uuid.uuid4()),
-                "parent_id": parent["parent_id"],
-                "parent_source":parent["source"],
-                "parent_title":parent["title"],
-                "chunk_type":"table_chunk",
-                "text":f"{title} | {text}",
-                "original_data": row
-            })
-            
-
-
-with open("children_json.json", "w") as childre:
-    json.dump(children, childre, indent=4)
\ No newline at end of file
+            yield make_child("table_chunk", f"{title} | {text}", row)
+
+
+def make_splitter():
+    return RecursiveCharacterTextSplitter(separators=["\n", "."], chunk_size=80, chunk_overlap=20)
+
+
+# -------------------------------
+# Streaming pipeline
+# -------------------------------
+_splitter = None
+
+
+def _init_worker():
+    # One splitter per worker process, built once
+    global _splitter
+    _splitter = make_splitter()
+
+
+def _chunk_batch(parents):
+    results = []
+    for parent in parents:
+        parent["parent_id"] = parent_id_for(parent)
+        results.append((parent, list(chunk_parent(parent, _splitter))))
+    return results
+
+
+def batched(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def iter_chunks(parents, workers=WORKERS, batch_size=BATCH_SIZE):
+    """
+    Yields (parent, children) for each parent, in input order. Parents are
+    split in batches of `batch_size` across `workers` processes, with at most
+    two batches per worker in flight, so memory stays bounded however long
+    the input is.
+    """
+    if workers <= 1:
+        _init_worker()
+        for batch in batched(parents, batch_size):
+            yield from _chunk_batch(batch)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        in_flight = deque()
+        for batch in batched(parents, batch_size):
+            in_flight.append(pool.submit(_chunk_batch, batch))
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def chunk_files(input_path, parents_path, children_path, workers=WORKERS, batch_size=BATCH_SIZE):
+    # Streams pages from `input_path` and appends parents and children as JSONL
+    counts = {"parents": 0, "children": 0}
+    titles = {}
+    tmp_paths = [f"{path}.{os.getpid()}.tmp" for path in (parents_path, children_path)]
+    try:
+        with open(tmp_paths[0], "w", encoding="utf-8") as parents_file, \
+                open(tmp_paths[1], "w", encoding="utf-8") as children_file:
+            for parent, children in iter_chunks(read_jsonl(input_path), workers, batch_size):
+                # Two pages on one ID would overwrite each other in every store
+                if parent["parent_id"] in titles:
+                    raise ValueError(
+                        f"Duplicate parent ID {parent['parent_id']} from {parent['source']!r}: "
+                        f"{titles[parent['parent_id']]!r} and {parent.get('title', '')!r}"
+                    )
+                titles[parent["parent_id"]] = parent.get("title", "")
+                parents_file.write(json.dumps(parent, ensure_ascii=False) + "\n")
+                for child in children:
+                    children_file.write(json.dumps(child, ensure_ascii=False) + "\n")
+                counts["parents"] += 1
+                counts["children"] += len(children)
+    except BaseException:
+        for tmp_path in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    for tmp_path, path in zip(tmp_paths, (parents_path, children_path)):
+        os.replace(tmp_path, path)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split scraped pages into parent and child chunks.")
+    parser.add_argument("--input", default="scraped_data_final.jsonl",
+                        help="Scraped pages as JSON Lines (a JSON array is also accepted).")
+    parser.add_argument("--parents", default="json_data/parent.jsonl")
+    parser.add_argument("--children", default="json_data/child.jsonl")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Splitter processes; 1 splits in-process.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Pages sent to a worker at a time.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = chunk_files(args.input, args.parents, args.children, args.workers, args.batch_size)
+    elapsed = time.perf_counter() - start
+    rate = counts["parents"] / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Wrote {counts['parents']} parents and {counts['children']} children "
+          f"in {elapsed:.1f}s ({rate:.1f} pages/sec).")
+
+
+if __name__ == "__main__":
+    main()
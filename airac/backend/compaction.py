@@ -0,0 +1,135 @@
+import re
+import json
+from functools import lru_cache
+from hybrid import tokenize
+from groq_keys import estimate_tokens
+
+# Lines, further split where sentence-ending punctuation is followed by whitespace
+SENTENCE = re.compile(r"\S[^\n]*?(?:[.!?]+(?=\s)|$)", re.MULTILINE)
+# Parents whose split sentences and rows are kept between requests
+ANALYSIS_CACHE_SIZE = 1024
+
+
+def terms(text: str) -> set[str]:
+    # BM25 tokens with a light plural strip, so "fees" matches "fee"
+    return {t[:-1] if len(t) > 3 and t.endswith("s") and not t.endswith("ss") else t for t in tokenize(text)}
+
+
+def split_sentences(text: str):
+    return [(m.start(), m.end(), m.group().strip()) for m in SENTENCE.finditer(text) if m.group().strip()]
+
+
+def overlap(query_terms: set[str], unit_terms) -> float:
+    if not query_terms:
+        return 0.0
+    return len(query_terms & unit_terms) / len(query_terms)
+
+
+# Only the query changes between requests for the same parent, so its
+# sentences and rows are split, tokenized and sized once
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def analyse_text(text: str):
+    return tuple(
+        (start, end, sentence, frozenset(terms(sentence)), estimate_tokens(sentence))
+        for start, end, sentence in split_sentences(text)
+    )
+
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def analyse_tables(tables: str):
+    rows = []
+    for row in json.loads(tables):
+        content = json.dumps(row, ensure_ascii=False)
+        rows.append((frozenset(terms(content)), estimate_tokens(content)))
+    return tuple(rows)
+
+
+def text_units(parent, query_terms, matched, rank):
+    sentences = analyse_text(parent["text"])
+
+    # Sentences covered by a retrieved text chunk anchor the window around the match
+    anchors = set()
+    for chunk in matched:
+        if not isinstance(chunk, str):
+            continue
+        start = parent["text"].find(chunk)
+        if start < 0:
+            continue
+        end = start + len(chunk)
+        anchors.update(i for i, (s, e, *_) in enumerate(sentences) if s < end and e > start)
+
+    units = []
+    for i, (start, end, sentence, sentence_terms, tokens) in enumerate(sentences):
+        proximity = 1 / (1 + min(abs(i - a) for a in anchors)) if anchors else 0.0
+        score = (overlap(query_terms, sentence_terms) + proximity) / (rank + 1)
+        units.append({
+            "kind": "text", "rank": rank, "position": i, "span": (start, end), "content": sentence,
+            "tokens": tokens, "score": score
+        })
+    return units
+
+
+def table_units(parent, query_terms, matched, rank):
+    units = []
+    rows = analyse_tables(json.dumps(parent["tables"], ensure_ascii=False))
+    for i, (row, (row_terms, tokens)) in enumerate(zip(parent["tables"], rows)):
+        score = overlap(query_terms, row_terms) + (1.0 if row in matched else 0.0)
+        units.append({
+            "kind": "table", "rank": rank, "position": i, "content": row, "tokens": tokens, "score": score / (rank + 1)
+        })
+    return units
+
+
+def compact(query: str, parents, matched=None, token_budget: int = 1000):
+    """
+    Shrinks parents to the sentences and table rows relevant to the query,
+    within token_budget. Units are ranked by query-term overlap, by closeness
+    to the child chunks retrieval matched on (`matched` maps parent_id to their
+    original_data) and by parent rank, then kept in document order. Context
+    that already fits the budget is returned unchanged.
+    """
+    matched = matched or {}
+    query_terms = terms(query)
+
+    units = []
+    for rank, parent in enumerate(parents):
+        hits = matched.get(parent["parent_id"], [])
+        units.extend(text_units(parent, query_terms, hits, rank))
+        units.extend(table_units(parent, query_terms, hits, rank))
+
+    if sum(u["tokens"] for u in units) <= token_budget:
+        return parents
+
+    # Nothing relates to the query: keep the leading units of the top parent
+    relevant = [u for u in units if u["score"] > 0]
+    if not relevant:
+        relevant = [u for u in units if u["rank"] == 0]
+        for u in relevant:
+            u["score"] = 1 / (1 + u["position"])
+
+    used = 0
+    for u in sorted(relevant, key=lambda u: u["score"], reverse=True):
+        size = u["tokens"]
+        if used + size <= token_budget:
+            u["kept"] = True
+            used += size
+
+    compacted = []
+    for rank, parent in enumerate(parents):
+        kept = [u for u in units if u["rank"] == rank and u.get("kept")]
+        sentences = [u for u in kept if u["kind"] == "text"]
+        rows = [u["content"] for u in kept if u["kind"] == "table"]
+        if not kept:
+            continue
+
+        # Adjacent sentences keep their original separator; gaps are marked so
+        # the model does not read them as contiguous
+        text = ""
+        for previous, u in zip([None] + sentences, sentences):
+            if previous is not None and u["position"] == previous["position"] + 1:
+                text += parent["text"][previous["span"][1]:u["span"][0]]
+            elif previous is not None:
+                text += "\n…\n"
+            text += u["content"]
+        compacted.append({**parent, "text": text, "tables": rows})
+    return compacted or parents[:1]
@@ -0,0 +1,67 @@
+import time
+import asyncio
+import contextvars
+from metrics import counter
+
+# time.monotonic() by which the current request must be answered; set by app.py
+request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+DEADLINE_EXCEEDED = counter(
+    "airac_deadline_exceeded_total", "Pipeline stages cut off by the request deadline.", ["stage"]
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def remaining():
+    # Seconds left for the current request, or None without a deadline
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget_low(reserve: float) -> bool:
+    left = remaining()
+    return left is not None and left < reserve
+
+
+def timeout(default: float = None):
+    # Timeout for an outbound call: the remaining budget, capped at `default`
+    left = remaining()
+    if left is None:
+        return default
+    left = max(left, 0.0)
+    return left if default is None else min(left, default)
+
+
+def expire(stage: str):
+    DEADLINE_EXCEEDED.inc(stage=stage)
+    return DeadlineExceeded(f"Request deadline exceeded in {stage}")
+
+
+def checked(stage: str, fn):
+    # Sync stages cannot be interrupted; they only refuse to start late
+    def wrapper(*args, **kwargs):
+        left = remaining()
+        if left is not None and left <= 0:
+            raise expire(stage)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def bounded(stage: str, fn):
+    # Async stages get the remaining budget as their timeout
+    async def wrapper(*args, **kwargs):
+        left = remaining()
+        if left is None:
+            return await fn(*args, **kwargs)
+        if left <= 0:
+            raise expire(stage)
+        try:
+            return await asyncio.wait_for(fn(*args, **kwargs), left)
+        except DeadlineExceeded:
+            raise
+        except TimeoutError:
+            raise expire(stage) from None
+    return wrapper
@@ -1,97 +1,193 @@
 import os
 import json
-import requests
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from itertools import islice
 from dotenv import load_dotenv
 from pinecone import Pinecone, ServerlessSpec
+from embeddings import JinaEmbeddings
+from jsonl import read_jsonl
+import parent_store
 
 load_dotenv()
 
-JINA_API_KEY = os.getenv("JINA_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 PINECONE_CLOUD = os.getenv("PINECONE_CLOUD", "gcp")
 PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east1-gcp")
+PINECONE_CACHE_INDEX_NAME = os.getenv("PINECONE_CACHE_INDEX_NAME", "semantic-cache-jina-api")
 
-DIMENSION = 1024  
-
-def get_jina_embedding(text: str):
-    url = "https://api.jina.ai/v1/embeddings"
-    headers = {
-        "Authorization": f"Bearer {JINA_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    payload = {"model": "jina-embeddings-v3", "input": text, "task": "retrieval.passage"}
-    response = requests.post(url, headers=headers, json=payload)
-
-    if response.status_code != 200:
-        raise Exception(f"Jina API Error: {response.text}")
-
-    return response.json()["data"][0]["embedding"]
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-if PINECONE_INDEX_NAME not in [i["name"] for i in pc.list_indexes()]:
-    print(f"Creating new index '{PINECONE_INDEX_NAME}' with dimension {DIMENSION}...")
-    pc.create_index(
-        name=PINECONE_INDEX_NAME,
-        dimension=DIMENSION,
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud=PINECONE_CLOUD,
-            region=PINECONE_REGION,
-        ),
-    )
-
-index = pc.Index(PINECONE_INDEX_NAME)
-
-with open("json_data/parent.json", "r", encoding="utf-8") as f:
-    parents = json.load(f)
-
-with open("json_data/child.json", "r", encoding="utf-8") as f:
-    children = json.load(f)
-
-parent_lookup = {p["parent_id"]: p for p in parents}
-
+DIMENSION = 1024
 BATCH_SIZE = 50
-
-def chunk_list(lst, n):
-    for i in range(0, len(lst), n):
-        yield lst[i:i + n]
-
-for batch in chunk_list(children, BATCH_SIZE):
+WORKERS = 4
+MANIFEST_PATH = "json_data/manifest.json"
+DELETE_BATCH_SIZE = 1000
+
+
+def chunk_list(items, n):
+    items = iter(items)
+    while batch := list(islice(items, n)):
+        yield batch
+
+
+def provision(pc):
+    # The API server expects both indexes to exist and never creates them
+    existing = [i["name"] for i in pc.list_indexes()]
+    for name in (PINECONE_INDEX_NAME, PINECONE_CACHE_INDEX_NAME):
+        if name not in existing:
+            print(f"Creating new index '{name}' with dimension {DIMENSION}...")
+            pc.create_index(
+                name=name,
+                dimension=DIMENSION,
+                metric="cosine",
+                spec=ServerlessSpec(
+                    cloud=PINECONE_CLOUD,
+                    region=PINECONE_REGION,
+                ),
+            )
+        print(f"Index '{name}' host: {pc.describe_index(name).host}")
+
+
+def get_index():
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    provision(pc)
+    return pc.Index(PINECONE_INDEX_NAME)
+
+
+# -------------------------------
+# Manifest of embedded children
+# -------------------------------
+class Manifest:
+    """child_id -> parent_id for every vector committed to the index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.children = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.children = json.load(f).get("children", {})
+
+    def commit(self, added=(), removed=()):
+        # Written after every batch, so an interrupted run resumes where it stopped
+        with self.lock:
+            for child in added:
+                self.children[child["child_id"]] = child["parent_id"]
+            for child_id in removed:
+                self.children.pop(child_id, None)
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"children": self.children}, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+# -------------------------------
+# Ingestion
+# -------------------------------
+def build_vectors(batch, embeddings):
+    # Parents live in the parent store, so vectors only carry the reference
     vectors = []
-    for child in batch:
-        emb = get_jina_embedding(child["text"])
-        parent = parent_lookup.get(child["parent_id"], {})
-
+    for child, emb in zip(batch, embeddings):
         vectors.append({
             "id": child["child_id"],
             "values": emb,
             "metadata": {
                 "parent_id": child["parent_id"],
-                "parent_source": parent.get("source", ""),
-                "parent_title": parent.get("title", ""),
-                "parent_text": parent.get("text", ""),
-                "child_text": child["text"],
                 "original_data": json.dumps(child.get("original_data", {})),
-                "parent_tables": json.dumps(parent.get("tables", [])),
             }
         })
-
-    print(f"Uploading batch of {len(vectors)} vectors...")
-    index.upsert(vectors=vectors)
-
-print("✅ All vectors have been uploaded to Pinecone.")
-
-query = "What time is breakfast served in the mess?"
-query_embedding = get_jina_embedding(query)
-
-results = index.query(vector=query_embedding, top_k=2, include_metadata=True)
-
-for match in results["matches"]:
-    print(f"\n--- Child (Score: {match['score']:.4f}) ---")
-    print(match["metadata"]["child_text"])
-    print("\n--- Parent ---")
-    print(f"Title: {match['metadata']['parent_title']}")
-    print(f"Source: {match['metadata']['parent_source']}")
-    print(match["metadata"]["parent_text"])
+    return vectors
+
+
+def ingest(index, embedder, children, batch_size=BATCH_SIZE, workers=WORKERS,
+           manifest_path=MANIFEST_PATH, full=False):
+    manifest = Manifest(manifest_path)
+
+    # `children` is consumed as a stream; only the IDs seen so far are kept.
+    # Child IDs are content hashes, so unchanged chunks keep their ID and can be skipped
+    current_ids = set()
+
+    def pending():
+        for child in children:
+            current_ids.add(child["child_id"])
+            if full or child["child_id"] not in manifest.children:
+                yield child
+
+    def process(batch):
+        # One embedding request and one upsert per batch
+        embeddings = embedder.embed_batch([child["text"] for child in batch])
+        index.upsert(vectors=build_vectors(batch, embeddings))
+        manifest.commit(added=batch)
+        return len(batch)
+
+    uploaded = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # At most two batches per worker are read ahead of the uploads
+        in_flight = set()
+        for batch in chunk_list(pending(), batch_size):
+            in_flight.add(pool.submit(process, batch))
+            if len(in_flight) >= 2 * workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                uploaded += sum(future.result() for future in done)
+                print(f"Uploaded {uploaded} vectors...")
+        for future in as_completed(in_flight):
+            uploaded += future.result()
+            print(f"Uploaded {uploaded} vectors...")
+
+    # Stale vectors are known only once the whole stream has been read
+    removed = [child_id for child_id in manifest.children if child_id not in current_ids]
+    for batch in chunk_list(removed, DELETE_BATCH_SIZE):
+        index.delete(ids=batch)
+        manifest.commit(removed=batch)
+    elapsed = time.perf_counter() - start
+
+    rate = uploaded / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Uploaded {uploaded} vectors in {elapsed:.1f}s ({rate:.1f} vectors/sec), deleted {len(removed)}, "
+          f"{len(current_ids) - uploaded} unchanged.")
+    return uploaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed child chunks with Jina and upsert them into Pinecone.")
+    parser.add_argument("--parents", default=parent_store.PARENTS_PATH)
+    parser.add_argument("--children", default="json_data/child.jsonl")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--parent-store", default=parent_store.STORE_PATH)
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--full", action="store_true", help="Re-embed every child, not just new or changed ones.")
+    parser.add_argument("--query", help="Run a sample query against the index after ingestion.")
+    parser.add_argument("--provision-only", action="store_true", help="Create the indexes and exit.")
+    args = parser.parse_args()
+
+    if args.provision_only:
+        provision(Pinecone(api_key=PINECONE_API_KEY))
+        return
+
+    parent_store.build(read_jsonl(args.parents), args.parent_store)
+
+    index = get_index()
+    embedder = JinaEmbeddings()
+    ingest(index, embedder, read_jsonl(args.children), args.batch_size, args.workers, args.manifest, args.full)
+
+    if args.query:
+        parents = parent_store.ParentStore(args.parent_store, args.parents)
+        results = index.query(vector=embedder.embed(args.query), top_k=2, include_metadata=True)
+
+        for match in results["matches"]:
+            parent = parents.get(match["metadata"]["parent_id"]) or {}
+            print(f"\n--- Child (Score: {match['score']:.4f}) ---")
+            print(match["metadata"]["original_data"])
+            print("\n--- Parent ---")
+            print(f"Title: {parent.get('title', '')}")
+            print(f"Source: {parent.get('source', '')}")
+            print(parent.get("text", ""))
+
+
+if __name__ == "__main__":
+    main()
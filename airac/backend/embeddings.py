@@ -0,0 +1,168 @@
+from dotenv import load_dotenv
+import os
+import threading
+import requests
+import httpx
+from cachetools import LRUCache
+from metrics import counter, span
+from deadline import timeout
+
+EMBEDDING_CACHE_REQUESTS = counter(
+    "airac_embedding_cache_requests_total", "Query embedding cache lookups.", ["result"]
+)
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class JinaEmbeddings:
+    def __init__(self, max_cache_size: int = 4096, shared=None):
+        load_dotenv()
+        self.JINA_API_KEY = os.getenv("JINA_API_KEY")
+        self.url = "https://api.jina.ai/v1/embeddings"
+        self.model = "jina-embeddings-v3"
+        self.task = "retrieval.passage"
+        # Upper bound per query-time call; a request deadline shortens it
+        self.timeout = float(os.getenv("JINA_TIMEOUT", "10"))
+
+        # Query vectors keyed by normalized text, so repeated questions skip Jina
+        self.lru = LRUCache(maxsize=max_cache_size)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Optional SharedCache behind the LRU, filled by every worker on the host
+        self.shared = shared
+
+        self.session = requests.Session()
+        self.http_client = None
+
+    def _payload(self, text):
+        headers = {
+            "Authorization": f"Bearer {self.JINA_API_KEY}",
+            "Content-Type": "application/json",
+        }
+        payload = {"model": self.model, "input": text, "task": self.task}
+        return headers, payload
+
+    def _counted(self, key: str, embedding, result: str):
+        # Vectors found in the shared cache are kept in the LRU too
+        with self.lock:
+            if embedding is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if result == "shared_hit":
+                    self.lru[key] = embedding
+        EMBEDDING_CACHE_REQUESTS.inc(result="miss" if embedding is None else result)
+        return embedding
+
+    def _lookup(self, key: str):
+        with self.lock:
+            embedding = self.lru.get(key)
+        if embedding is not None or self.shared is None:
+            return self._counted(key, embedding, "hit")
+        return self._counted(key, self.shared.get("embedding", key), "shared_hit")
+
+    async def _alookup(self, key: str):
+        with self.lock:
+            embedding = self.lru.get(key)
+        if embedding is not None or self.shared is None:
+            return self._counted(key, embedding, "hit")
+        return self._counted(key, await self.shared.aget("embedding", key), "shared_hit")
+
+    def _store(self, key: str, embedding: list[float]):
+        with self.lock:
+            self.lru[key] = embedding
+        if self.shared is not None:
+            self.shared.add("embedding", key, embedding)
+
+    async def _astore(self, key: str, embedding: list[float]):
+        with self.lock:
+            self.lru[key] = embedding
+        if self.shared is not None:
+            await self.shared.aadd("embedding", key, embedding)
+
+    def embed(self, text: str) -> list[float]:
+        key = normalize_query(text)
+        embedding = self._lookup(key)
+        if embedding is not None:
+            return embedding
+
+        headers, payload = self._payload(text)
+        with span("jina.embed"):
+            response = self.session.post(self.url, headers=headers, json=payload, timeout=timeout(self.timeout))
+        if response.status_code != 200:
+            raise Exception(f"Jina API Error: {response.text}")
+
+        embedding = response.json()["data"][0]["embedding"]
+        self._store(key, embedding)
+        return embedding
+
+    async def aembed(self, text: str) -> list[float]:
+        key = normalize_query(text)
+        embedding = await self._alookup(key)
+        if embedding is not None:
+            return embedding
+
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(timeout=None)
+
+        headers, payload = self._payload(text)
+        with span("jina.embed"):
+            response = await self.http_client.post(
+                self.url, headers=headers, json=payload, timeout=timeout(self.timeout)
+            )
+        if response.status_code != 200:
+            raise Exception(f"Jina API Error: {response.text}")
+
+        embedding = response.json()["data"][0]["embedding"]
+        await self._astore(key, embedding)
+        return embedding
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        # Query vectors for several texts: LRU hits are served locally and the
+        # distinct misses go to Jina in a single request
+        keys = [normalize_query(text) for text in texts]
+        originals = dict(zip(keys, texts))
+        embeddings = {key: await self._alookup(key) for key in originals}
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+
+        if missing:
+            if self.http_client is None:
+                self.http_client = httpx.AsyncClient(timeout=None)
+
+            headers, payload = self._payload([originals[key] for key in missing])
+            with span("jina.embed"):
+                response = await self.http_client.post(
+                    self.url, headers=headers, json=payload, timeout=timeout(self.timeout)
+                )
+            if response.status_code != 200:
+                raise Exception(f"Jina API Error: {response.text}")
+
+            for d in response.json()["data"]:
+                key = missing[d["index"]]
+                embeddings[key] = d["embedding"]
+                await self._astore(key, d["embedding"])
+
+        return [embeddings[key] for key in keys]
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        # Passages are embedded in one request and are not kept in the query LRU
+        headers, payload = self._payload(texts)
+        response = self.session.post(self.url, headers=headers, json=payload)
+        if response.status_code != 200:
+            raise Exception(f"Jina API Error: {response.text}")
+
+        data = sorted(response.json()["data"], key=lambda d: d["index"])
+        return [d["embedding"] for d in data]
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.lru)}
+
+    async def aclose(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+        self.session.close()
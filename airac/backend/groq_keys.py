@@ -0,0 +1,206 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+import httpx
+from dotenv import load_dotenv
+from langchain_groq import ChatGroq
+from metrics import counter
+
+GROQ_REQUESTS = counter("airac_groq_requests_total", "LLM calls started, per Groq key.", ["key"])
+GROQ_RATE_LIMITED = counter("airac_groq_rate_limited_total", "429 responses, per Groq key.", ["key"])
+
+DURATION_PART = re.compile(r"([\d.]+)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value) -> float:
+    # Groq reports resets as e.g. "2m59.56s", "7.66s" or "500ms"
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return sum(float(n) * DURATION_UNITS[unit] for n, unit in DURATION_PART.findall(value))
+
+
+def estimate_tokens(text: str) -> int:
+    return tokens_for_length(len(text))
+
+
+def tokens_for_length(chars: int) -> int:
+    # ~4 characters per token for English text
+    return chars // 4 + 1
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.rate = refill_per_second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if self.level >= amount:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (min(amount, self.capacity) - self.level) / self.rate
+
+    def sync(self, remaining: float, limit: float, reset_seconds: float, now: float):
+        # The server's view replaces our estimate; the bucket refills to the
+        # limit over the reported reset window
+        self.capacity = limit or self.capacity
+        self.level = remaining
+        self.updated = now
+        if reset_seconds > 0 and self.capacity > remaining:
+            self.rate = (self.capacity - remaining) / reset_seconds
+
+
+class GroqKey:
+    """One API key: its request and token buckets and its cached client."""
+
+    def __init__(self, api_key: str, model_name: str, requests_per_minute: int, tokens_per_minute: int):
+        self.api_key = api_key
+        self.label = f"{api_key[:6]}***"
+        self.model_name = model_name
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.blocked_until = 0.0
+        self.rate_limited = 0
+        self.model = None
+
+    def refill(self, now: float):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+
+    def headroom(self) -> float:
+        return min(self.requests.level / self.requests.capacity, self.tokens.level / self.tokens.capacity)
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        # Seconds until this key can take a request of `tokens` tokens
+        return max(self.blocked_until - now, self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def update_from_headers(self, status_code: int, headers, now: float):
+        # Groq reports requests per day and tokens per minute: the daily
+        # figure only caps the local per-minute request bucket
+        if "x-ratelimit-remaining-requests" in headers:
+            self.requests.level = min(self.requests.level, float(headers["x-ratelimit-remaining-requests"]))
+        if "x-ratelimit-remaining-tokens" in headers:
+            self.tokens.sync(
+                float(headers["x-ratelimit-remaining-tokens"]),
+                float(headers.get("x-ratelimit-limit-tokens", 0)),
+                parse_duration(headers.get("x-ratelimit-reset-tokens")),
+                now
+            )
+        if status_code == 429:
+            self.rate_limited += 1
+            GROQ_RATE_LIMITED.inc(key=self.label)
+            self.blocked_until = now + max(parse_duration(headers.get("retry-after")), 1.0)
+
+
+class GroqKeyManager:
+    """
+    Pool of Groq API keys. Each key keeps request and token buckets that
+    start from GROQ_RPM / GROQ_TPM and are corrected from the x-ratelimit-*
+    headers of every response. acquire() reserves budget on the key with the
+    most headroom before the call, waiting only when every key is exhausted,
+    so 429s are avoided rather than retried. Safe to share across threads and
+    asyncio tasks; each key's client is created once and reused.
+    """
+
+    def __init__(self, model_name="llama-3.3-70b-versatile", transport=None):
+        load_dotenv()
+        keys = [key.strip() for key in os.getenv("GROQ_KEYS", "").split(",") if key.strip()]
+        if not keys:
+            raise ValueError("❌ No Groq API keys found in .env file (GROQ_KEYS).")
+
+        self.model_name = model_name
+        requests_per_minute = int(os.getenv("GROQ_RPM", "30"))
+        tokens_per_minute = int(os.getenv("GROQ_TPM", "12000"))
+        self.keys = [GroqKey(key, model_name, requests_per_minute, tokens_per_minute) for key in keys]
+        self.lock = threading.Lock()
+        # Optional httpx transport for the per-key clients (proxies, simulation)
+        self.transport = transport
+        # Upper bound per call; the request deadline cuts async calls shorter
+        self.timeout = float(os.getenv("GROQ_TIMEOUT", "30"))
+
+        # Jittered exponential backoff between attempts after a 429
+        self.backoff_base = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+        self.backoff_cap = float(os.getenv("GROQ_BACKOFF_CAP", "8"))
+
+    def _client_for(self, key: GroqKey):
+        def record(response):
+            with self.lock:
+                key.update_from_headers(response.status_code, response.headers, time.monotonic())
+
+        async def arecord(response):
+            record(response)
+
+        # Retries are left to the pool so a 429 moves to another key
+        return ChatGroq(
+            model=key.model_name,
+            api_key=key.api_key,
+            max_retries=0,
+            timeout=self.timeout,
+            http_client=httpx.Client(transport=self.transport, event_hooks={"response": [record]}),
+            http_async_client=httpx.AsyncClient(transport=self.transport, event_hooks={"response": [arecord]})
+        )
+
+    def _try_acquire(self, tokens: int):
+        # Returns (key, 0) on success or (None, seconds until a key frees up)
+        with self.lock:
+            now = time.monotonic()
+            for key in self.keys:
+                key.refill(now)
+            ready = [key for key in self.keys if key.wait_time(tokens, now) == 0]
+            if not ready:
+                return None, min(key.wait_time(tokens, now) for key in self.keys)
+
+            key = max(ready, key=lambda k: k.headroom())
+            key.requests.level -= 1
+            key.tokens.level -= tokens
+            GROQ_REQUESTS.inc(key=key.label)
+            if key.model is None:
+                key.model = self._client_for(key)
+            return key, 0.0
+
+    def acquire(self, tokens: int = 0) -> GroqKey:
+        while True:
+            key, wait = self._try_acquire(tokens)
+            if key is not None:
+                return key
+            time.sleep(min(wait, self.backoff_cap))
+
+    async def aacquire(self, tokens: int = 0) -> GroqKey:
+        while True:
+            key, wait = self._try_acquire(tokens)
+            if key is not None:
+                return key
+            await asyncio.sleep(min(wait, self.backoff_cap))
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter keeps concurrent retries from landing together
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def stats(self):
+        with self.lock:
+            now = time.monotonic()
+            for key in self.keys:
+                key.refill(now)
+            return [
+                {
+                    "key": key.label,
+                    "requests_left": round(key.requests.level, 1),
+                    "tokens_left": round(key.tokens.level),
+                    "rate_limited": key.rate_limited,
+                    "blocked_for": round(max(key.blocked_until - now, 0.0), 1)
+                }
+                for key in self.keys
+            ]
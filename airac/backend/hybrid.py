@@ -0,0 +1,111 @@
+import re
+import json
+import math
+import asyncio
+from collections import Counter, defaultdict
+import numpy as np
+from jsonl import read_jsonl
+
+CHILDREN_PATH = "json_data/child.jsonl"
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "in", "on", "at", "to", "for", "and",
+    "or", "what", "when", "where", "which", "who", "how", "do", "does", "did", "i", "me", "my", "we",
+    "you", "it", "this", "that", "there", "with", "by", "from", "as", "can", "tell", "about", "please",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over child chunk text, held entirely in memory."""
+
+    def __init__(self, children, k1: float = 1.5, b: float = 0.75):
+        # One pass, so `children` can be a stream read from child.jsonl
+        self.ids = []
+        self.metadata = []
+        lengths = []
+        postings = defaultdict(list)
+        for i, child in enumerate(children):
+            self.ids.append(child["child_id"])
+            self.metadata.append(
+                {"parent_id": child["parent_id"], "original_data": json.dumps(child.get("original_data", {}))}
+            )
+            counts = Counter(tokenize(child["text"]))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((i, tf))
+
+        lengths = np.asarray(lengths, dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) else 0.0
+        norm = k1 * (1 - b + b * lengths / max(avg_length, 1e-9))
+
+        # Per-term document indices and precomputed BM25 weights
+        self.terms = {}
+        n = len(self.ids)
+        for term, entries in postings.items():
+            docs = np.asarray([d for d, _ in entries], dtype=np.int64)
+            tf = np.asarray([t for _, t in entries], dtype=np.float32)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.terms[term] = (docs, idf * tf * (k1 + 1) / (tf + norm[docs]))
+        self.size = n
+
+    def search(self, query: str, top_k: int = 10):
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self.terms:
+                docs, weights = self.terms[term]
+                scores[docs] += weights
+
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        if top_k == 0:
+            return {"matches": []}
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return {"matches": [
+            {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i]}
+            for i in top
+        ]}
+
+
+def reciprocal_rank_fusion(*results, k: int = 60):
+    fused = {}
+    for result in results:
+        for rank, match in enumerate(result.get("matches", [])):
+            entry = fused.setdefault(match["id"], {"id": match["id"], "score": 0.0, "metadata": match["metadata"]})
+            entry["score"] += 1.0 / (k + rank + 1)
+    return {"matches": sorted(fused.values(), key=lambda m: m["score"], reverse=True)}
+
+
+class HybridRetriever:
+    """
+    Runs BM25 over the local child chunks alongside the dense retriever and
+    fuses both rankings with reciprocal-rank fusion. BM25 is in-process, so
+    this adds no network round-trips over dense search alone.
+    """
+
+    def __init__(self, dense, children_path: str = CHILDREN_PATH, top_k: int = 10, rrf_k: int = 60):
+        self.bm25 = BM25Index(read_jsonl(children_path))
+        self.dense = dense
+        self.embedder = dense.embedder
+        self.top_k = top_k
+        self.rrf_k = rrf_k
+
+    def get(self, query, query_embedding=None, top_k=None):
+        top_k = top_k or self.top_k
+        dense = self.dense.get(query, query_embedding, top_k=top_k)
+        sparse = self.bm25.search(query, top_k)
+        return reciprocal_rank_fusion(dense, sparse, k=self.rrf_k)
+
+    async def aget(self, query, query_embedding=None, top_k=None):
+        top_k = top_k or self.top_k
+        dense, sparse = await asyncio.gather(
+            self.dense.aget(query, query_embedding, top_k=top_k),
+            asyncio.to_thread(self.bm25.search, query, top_k)
+        )
+        return reciprocal_rank_fusion(dense, sparse, k=self.rrf_k)
+
+    async def aclose(self):
+        await self.dense.aclose()
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+from embeddings import JinaEmbeddings
+from jsonl import read_jsonl
+from metrics import span
+
+CHILDREN_PATH = "json_data/child.jsonl"
+EMBEDDINGS_PATH = "json_data/child_embeddings.npy"
+
+
+def ids_path_for(embeddings_path):
+    # Row order of the matrix, so a rebuild can reuse rows of unchanged children
+    return f"{os.path.splitext(embeddings_path)[0]}.ids.json"
+
+
+class RetrieveLocal:
+    """
+    In-process drop-in for RetrievePinecone over the child chunks in json_data.
+
+    The embedding matrix is a memory-mapped .npy file of L2-normalized rows, so
+    loading is near-instant and every uvicorn worker shares the same read-only
+    pages through the OS page cache.
+    """
+
+    def __init__(self, embedder=None, children_path=None, embeddings_path=None):
+        load_dotenv()
+        self.embedder = embedder or JinaEmbeddings()
+        children_path = children_path or os.getenv("LOCAL_INDEX_CHILDREN", CHILDREN_PATH)
+        embeddings_path = embeddings_path or os.getenv("LOCAL_INDEX_EMBEDDINGS", EMBEDDINGS_PATH)
+
+        # Same metadata layout as the vectors upserted by embedding_pinecone.py
+        self.ids = []
+        self.metadata = []
+        for child in read_jsonl(children_path):
+            self.ids.append(child["child_id"])
+            self.metadata.append(
+                {"parent_id": child["parent_id"], "original_data": json.dumps(child.get("original_data", {}))}
+            )
+
+        self.matrix = np.load(embeddings_path, mmap_mode="r")
+
+        ids_path = ids_path_for(embeddings_path)
+        if os.path.exists(ids_path):
+            with open(ids_path, "r", encoding="utf-8") as f:
+                stale = json.load(f) != self.ids
+        else:
+            stale = self.matrix.shape[0] != len(self.ids)
+        if stale:
+            raise ValueError(
+                f"{embeddings_path} does not match the children in {children_path}. "
+                f"Rebuild it with `python backend/local_index.py`."
+            )
+
+    def search(self, query_embedding, top_k=1):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return {"matches": []}
+
+        # Rows are unit vectors, so one matrix-vector product gives every cosine score
+        with span("local_index.search"):
+            scores = self.matrix @ (query / norm)
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        return {"matches": [
+            {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i]}
+            for i in top
+        ]}
+
+    def search_batch(self, query_embeddings, top_k=1):
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        # One matrix-matrix product scores every query against every row
+        with span("local_index.search"):
+            scores = self.matrix @ (queries / np.maximum(norms, 1e-12)).T
+        top_k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, top_k - 1, axis=0)[:top_k]
+
+        results = []
+        for j in range(queries.shape[0]):
+            if norms[j, 0] == 0:
+                results.append({"matches": []})
+                continue
+            column = top[:, j][np.argsort(-scores[top[:, j], j])]
+            results.append({"matches": [
+                {"id": self.ids[i], "score": float(scores[i, j]), "metadata": self.metadata[i]}
+                for i in column
+            ]})
+        return results
+
+    async def asearch_batch(self, query_embeddings, top_k=1):
+        return self.search_batch(query_embeddings, top_k)
+
+    def get(self, query, query_embedding=None, top_k=1):
+        if query_embedding is None:
+            query_embedding = self.embedder.embed(query)
+        return self.search(query_embedding, top_k)
+
+    async def aget(self, query, query_embedding=None, top_k=1):
+        if query_embedding is None:
+            query_embedding = await self.embedder.aembed(query)
+        return self.search(query_embedding, top_k)
+
+    async def aclose(self):
+        pass
+
+
+def build(children_path=CHILDREN_PATH, embeddings_path=EMBEDDINGS_PATH, batch_size=50):
+    # Child IDs are content hashes: reuse the rows of children that did not change
+    ids_path = ids_path_for(embeddings_path)
+    previous = {}
+    if os.path.exists(embeddings_path) and os.path.exists(ids_path):
+        with open(ids_path, "r", encoding="utf-8") as f:
+            previous_ids = json.load(f)
+        previous_matrix = np.load(embeddings_path, mmap_mode="r")
+        if previous_matrix.shape[0] == len(previous_ids):
+            previous = {child_id: previous_matrix[i] for i, child_id in enumerate(previous_ids)}
+
+    # Children are streamed: only their IDs and the missing ones of the
+    # current batch are held, never the whole file
+    embedder = JinaEmbeddings()
+    ids = []
+    fresh = {}
+    batch = []
+
+    def embed(batch):
+        for child, emb in zip(batch, embedder.embed_batch([child["text"] for child in batch])):
+            fresh[child["child_id"]] = emb
+        print(f"Embedded {len(fresh)} children...")
+
+    for child in read_jsonl(children_path):
+        ids.append(child["child_id"])
+        if child["child_id"] not in previous:
+            batch.append(child)
+            if len(batch) >= batch_size:
+                embed(batch)
+                batch = []
+    if batch:
+        embed(batch)
+    print(f"Reused {len(ids) - len(fresh)} embeddings, embedded {len(fresh)} children.")
+
+    matrix = np.asarray(
+        [fresh[child_id] if child_id in fresh else previous[child_id] for child_id in ids],
+        dtype=np.float32
+    ).reshape(len(ids), -1)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    tmp_path = f"{embeddings_path}.tmp.npy"
+    np.save(tmp_path, matrix)
+    os.replace(tmp_path, embeddings_path)
+    with open(ids_path, "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+    print(f"✅ Wrote {matrix.shape[0]}x{matrix.shape[1]} embeddings to {embeddings_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local NumPy vector index.")
+    parser.add_argument("--children", default=CHILDREN_PATH)
+    parser.add_argument("--embeddings", default=EMBEDDINGS_PATH)
+    parser.add_argument("--query", help="Query the existing index instead of rebuilding it.")
+    args = parser.parse_args()
+
+    if args.query:
+        start = time.perf_counter()
+        obj = RetrieveLocal(children_path=args.children, embeddings_path=args.embeddings)
+        print(f"Loaded index in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for match in obj.get(args.query, top_k=3)["matches"]:
+            print(f"{match['score']:.4f}  {match['metadata']['original_data']}")
+    else:
+        build(args.children, args.embeddings)
@@ -0,0 +1,86 @@
+import os
+import json
+import sqlite3
+import threading
+from cachetools import LRUCache
+from jsonl import read_jsonl
+
+PARENTS_PATH = "json_data/parent.jsonl"
+STORE_PATH = "json_data/parents.db"
+
+
+class ParentStore:
+    """
+    Parent documents keyed by parent_id, so vectors and cache entries only need
+    to carry the ID. Backed by SQLite with an in-memory LRU in front; the
+    database is built from parent.jsonl on first use, and rebuilt when
+    parent.jsonl is newer, since re-chunking changes the parent IDs.
+    """
+
+    def __init__(self, path: str = STORE_PATH, parents_path: str = PARENTS_PATH, max_cache_size: int = 256):
+        if is_stale(path, parents_path):
+            build(read_jsonl(parents_path), path)
+
+        self.path = path
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.lru = LRUCache(maxsize=max_cache_size)
+        self.lock = threading.Lock()
+
+    def get(self, parent_id: str):
+        with self.lock:
+            parent = self.lru.get(parent_id)
+            if parent is not None:
+                return parent
+
+            row = self.conn.execute(
+                "SELECT parent_id, source, title, text, tables FROM parents WHERE parent_id = ?",
+                (parent_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            parent = {
+                "parent_id": row[0],
+                "source": row[1],
+                "title": row[2],
+                "text": row[3],
+                "tables": json.loads(row[4]),
+            }
+            self.lru[parent_id] = parent
+            return parent
+
+    def close(self):
+        self.conn.close()
+
+
+def is_stale(path: str = STORE_PATH, parents_path: str = PARENTS_PATH) -> bool:
+    if not os.path.exists(path):
+        return True
+    return os.path.exists(parents_path) and os.path.getmtime(parents_path) > os.path.getmtime(path)
+
+
+def build(parents, path: str = STORE_PATH):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    with conn:
+        conn.execute(
+            "CREATE TABLE parents (parent_id TEXT PRIMARY KEY, source TEXT, title TEXT, text TEXT, tables TEXT)"
+        )
+        # Rows are streamed, so `parents` can be a generator over a large file
+        rows = (
+            (p["parent_id"], p.get("source", ""), p.get("title", ""), p.get("text", ""),
+             json.dumps(p.get("tables", []), ensure_ascii=False))
+            for p in parents
+        )
+        conn.executemany("INSERT OR REPLACE INTO parents VALUES (?, ?, ?, ?, ?)", rows)
+        count = conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
+    conn.close()
+    os.replace(tmp_path, path)
+    print(f"✅ Wrote {count} parents to {path}")
+
+
+if __name__ == "__main__":
+    build(read_jsonl(PARENTS_PATH))
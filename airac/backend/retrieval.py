@@ -1,49 +1,53 @@
 import os
-import requests
+import asyncio
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import Pinecone
 import json
+from embeddings import JinaEmbeddings
+from metrics import span
 
 class RetrievePinecone:
-    def __init__(self):
+    def __init__(self, embedder=None):
         load_dotenv()
         self.PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
         self.PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-        self.JINA_API_KEY = os.getenv("JINA_API_KEY")
+        self.embedder = embedder or JinaEmbeddings()
         self.DIMENSION = 1024
 
         self.pc = Pinecone(api_key=self.PINECONE_API_KEY)
 
-        if self.PINECONE_INDEX_NAME not in [i["name"] for i in self.pc.list_indexes()]:
-            self.pc.create_index(
-                name=self.PINECONE_INDEX_NAME,
-                dimension=self.DIMENSION,
-                metric="cosine",
-                spec=ServerlessSpec(
-                    cloud=os.getenv("PINECONE_CLOUD"),
-                    region=os.getenv("PINECONE_REGION")
-                )
-            )
-
-        self.index = self.pc.Index(self.PINECONE_INDEX_NAME)
-
-    def get_jina_embedding(self, text: str):
-        url = "https://api.jina.ai/v1/embeddings"
-        headers = {
-            "Authorization": f"Bearer {self.JINA_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        payload = {"model": "jina-embeddings-v3", "input": text, "task": "retrieval.passage"}
-        response = requests.post(url, headers=headers, json=payload)
-
-        if response.status_code != 200:
-            raise Exception(f"Jina API Error: {response.text}")
-        return response.json()["data"][0]["embedding"]
-
-    def get(self, query):
-        query_embedding = self.get_jina_embedding(query)
-        results = self.index.query(vector=query_embedding, top_k=1, include_metadata=True)
-        return results
+        # The index is provisioned by embedding_pinecone.py; with
+        # PINECONE_INDEX_HOST set, startup makes no control-plane call at all
+        self.host = os.getenv("PINECONE_INDEX_HOST") or self.pc.describe_index(self.PINECONE_INDEX_NAME).host
+        self.index = self.pc.Index(host=self.host)
+
+        self.async_index = None
+
+    def get(self, query, query_embedding=None, top_k=1):
+        if query_embedding is None:
+            query_embedding = self.embedder.embed(query)
+        with span("pinecone.query"):
+            return self.index.query(vector=query_embedding, top_k=top_k, include_metadata=True)
+
+    async def aget(self, query, query_embedding=None, top_k=1):
+        if query_embedding is None:
+            query_embedding = await self.embedder.aembed(query)
+        return await self._aquery(query_embedding, top_k)
+
+    async def _aquery(self, query_embedding, top_k):
+        if self.async_index is None:
+            self.async_index = self.pc.IndexAsyncio(host=self.host)
+        with span("pinecone.query"):
+            return await self.async_index.query(vector=query_embedding, top_k=top_k, include_metadata=True)
+
+    async def asearch_batch(self, query_embeddings, top_k=1):
+        # Pinecone queries take one vector each, so a batch fans out concurrently
+        return await asyncio.gather(*(self._aquery(emb, top_k) for emb in query_embeddings))
+
+    async def aclose(self):
+        if self.async_index is not None:
+            await self.async_index.close()
+            self.async_index = None
 
 if __name__ == "__main__":
     obj = RetrievePinecone()
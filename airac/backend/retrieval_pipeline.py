@@ -1,14 +1,35 @@
 import sys
 import os
+import time
+import asyncio
+import json
 from dotenv import load_dotenv
 from langgraph.graph import START, END, StateGraph
 from typing import TypedDict
-from retrieval import RetrievePinecone
+from concurrent.futures import Future, ThreadPoolExecutor
+from hybrid import HybridRetriever
+from batching import BatchingEmbedder, BatchingRetriever
+from write_behind import WriteBehindCache
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 from cache import Cache
-from langchain_groq import ChatGroq
-from itertools import cycle
+from answer_cache import AnswerCache
+from shared_cache import SharedCache, SharedRetriever, SQLiteBackend, RedisBackend
+from table_index import TableIndex
+from jsonl import read_jsonl
+from parent_store import ParentStore
+from embeddings import JinaEmbeddings, normalize_query
+from single_flight import SingleFlight
+from groq_keys import GroqKeyManager, estimate_tokens, tokens_for_length
+from compaction import compact
+from metrics import counter, span, timed, atimed, TTFT_SECONDS
+from deadline import budget_low, bounded, checked, expire
+
+LLM_RETRIES = counter("airac_llm_retries_total", "LLM calls retried on another Groq key after a 429.")
+CACHE_WRITES_SKIPPED = counter(
+    "airac_cache_writes_skipped_total", "Semantic cache writes skipped because the request deadline was close."
+)
 
 
 # -------------------------------
@@ -16,149 +37,683 @@ from itertools import cycle
 # -------------------------------
 class ChatState(TypedDict):
     query: str
+    query_embedding: list[float]
+    parent_ids: list[str]
     retrieved_text: str
     retrieved_tables: list[str]
     answer: str
+    cache_tier: str
+    prompt_tokens: int
+    prompt_tokens_full: int
+    # Speculative retrieval: the branch results the join node chooses from,
+    # and the signal that lets the index search stop once the cache has hit
+    cache_match: list
+    index_result: dict
+    cache_hit: asyncio.Event
 
 
 # -------------------------------
-# 2. Key Manager for Groq
+# 2. RAG Pipeline (Badal)
 # -------------------------------
-class GroqKeyManager:
-    def __init__(self, model_name="llama-3.3-70b-versatile"):
+class Badal:
+    def __init__(self, key_manager=None, embedder=None, cache=None, retriever=None, parent_store=None):
         load_dotenv()
-        keys = os.getenv("GROQ_KEYS", "").split(",")
-        if not keys or keys == [""]:
-            raise ValueError("❌ No Groq API keys found in .env file (GROQ_KEYS).")
+        # Each LLM call reserves budget on the Groq key with the most headroom
+        self.key_manager = key_manager or GroqKeyManager()
+        self.llm_attempts = int(os.getenv("GROQ_MAX_ATTEMPTS", "3"))
+        self.completion_tokens = int(os.getenv("GROQ_COMPLETION_TOKENS", "512"))
+        # Near the request deadline: with less than DEADLINE_LLM_RESERVE seconds
+        # left, a cached answer is served instead of starting an LLM call, and
+        # with less than DEADLINE_WRITE_RESERVE the semantic cache write is skipped
+        self.llm_reserve = float(os.getenv("DEADLINE_LLM_RESERVE", "1"))
+        self.write_reserve = float(os.getenv("DEADLINE_WRITE_RESERVE", "0.2"))
 
-        self.keys = cycle(keys)  # infinite round-robin
-        self.model_name = model_name
-        self.current_key = next(self.keys)
+        # Concurrent requests within BATCH_MAX_WAIT_MS share one embedding call
+        # and one vector search, up to BATCH_MAX_SIZE requests per batch
+        self.micro_batching = os.getenv("MICRO_BATCHING", "true").lower() == "true"
+        self.batch_max_size = int(os.getenv("BATCH_MAX_SIZE", "32"))
+        self.batch_max_wait_ms = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
 
-    def get_model(self):
-        return ChatGroq(model=self.model_name, api_key=self.current_key)
+        # Embeddings, index results and answers shared by every worker on the host
+        self.shared_cache = self.build_shared_cache()
+        # One embedding provider shared by the cache and the retriever, so a
+        # request pays for at most one Jina round-trip
+        self.embedder = embedder or self.build_embedder()
+        # TABLE_FAST_PATH answers clear row/column lookups on the parents'
+        # tables straight from an in-memory index, without retrieval or the LLM
+        self.table_fast_path = os.getenv("TABLE_FAST_PATH", "true").lower() == "true"
+        # The cache, the retriever and the parent store each open a remote
+        # index or load a file on creation, so they are built side by side
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            cache = cache or pool.submit(self.build_cache)
+            retriever = retriever or pool.submit(self.build_retriever)
+            parent_store = parent_store or pool.submit(self.build_parent_store)
+            table_index = pool.submit(self.build_table_index) if self.table_fast_path else None
+        self.cache, self.retriever, self.parent_store, self.table_index = (
+            c.result() if isinstance(c, Future) else c for c in (cache, retriever, parent_store, table_index)
+        )
 
-    def rotate_key(self):
-        self.current_key = next(self.keys)
-        print(f"🔄 Switching API key... Now using: {self.current_key[:6]}***")
-        return self.get_model()
+        # Tiered answer cache: exact-match L1 in process, then the semantic
+        # cache, whose stored answer is reused above answer_threshold
+        self.answer_cache = AnswerCache(
+            max_size=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            shared=self.shared_cache
+        )
+        self.answer_threshold = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.98"))
+        # Identical questions arriving while one is still running share its result
+        self.single_flight = SingleFlight()
+        # RETRIEVAL_MODE=speculative searches the index while the semantic
+        # cache is consulted, instead of only after a cache miss. That saves
+        # the cache lookup on a miss, but every cache hit also spends an index
+        # search: once handed to the micro-batcher it cannot be withdrawn,
+        # and the extra load raised hit-path p99 in bench_speculative.py
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "sequential").lower()
+        if self.retrieval_mode not in ("sequential", "speculative"):
+            raise ValueError(
+                f"❌ Unknown RETRIEVAL_MODE '{self.retrieval_mode}' (expected 'sequential' or 'speculative')."
+            )
+        # Batch queries: at most BATCH_QUERY_MAX per request, answered
+        # BATCH_QUERY_CONCURRENCY at a time
+        self.batch_query_max = int(os.getenv("BATCH_QUERY_MAX", "256"))
+        self.batch_query_concurrency = int(os.getenv("BATCH_QUERY_CONCURRENCY", "4"))
 
+        # Context assembly: up to max_context_parents distinct parents in
+        # rank order, within context_char_budget characters
+        self.max_context_parents = int(os.getenv("MAX_CONTEXT_PARENTS", "3"))
+        self.context_char_budget = int(os.getenv("CONTEXT_CHAR_BUDGET", "24000"))
+        # Query-focused compaction of the assembled context to CONTEXT_TOKEN_BUDGET
+        self.compaction = os.getenv("CONTEXT_COMPACTION", "true").lower() == "true"
+        self.context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+        self.str_parser = StrOutputParser()
+        self.prompt = PromptTemplate(
+            input_variables=["query", "parent_text", "parent_tables"],
+            template="""
+                You are a helpful assistant. Use the given **text** and **table rows** to answer questions. 
+                Question : {query}
 
-# -------------------------------
-# 3. RAG Pipeline (Badal)
-# -------------------------------
-class Badal:
-    def __init__(self):
-        self.key_manager = GroqKeyManager()
-        self.model = self.key_manager.get_model()
+                (NOTE: TABLES AND ROWS data may and may not exist.)
 
-        self.cache = Cache()
-        self.retriever = RetrievePinecone()   # <-- Jina embeddings assumed
-        self.str_parser = StrOutputParser()
+                --- Parent Text ---
+                {parent_text}
+
+                --- Parent Tables (rows as JSON) ---
+                {parent_tables}
+
+                Based on both the text and the tables, give a clear and concise response.
+
+                Only reply with the answer and nothing else.
+            """
+        )
         self.graph = self.graph_building()
 
+    def build_shared_cache(self):
+        # SHARED_CACHE_BACKEND=sqlite (a database in /dev/shm) or redis puts a
+        # host-wide tier behind the per-process caches. If it cannot be opened,
+        # or fails later, the workers fall back to per-process caching.
+        backend = os.getenv("SHARED_CACHE_BACKEND", "off").lower()
+        if backend == "off":
+            return None
+        if backend not in ("sqlite", "redis"):
+            raise ValueError(f"❌ Unknown SHARED_CACHE_BACKEND '{backend}' (expected 'off', 'sqlite' or 'redis').")
+
+        timeout = float(os.getenv("SHARED_CACHE_TIMEOUT", "0.1"))
+        try:
+            if backend == "sqlite":
+                store = SQLiteBackend(os.getenv("SHARED_CACHE_PATH") or None, busy_timeout=timeout)
+            else:
+                store = RedisBackend(os.getenv("SHARED_CACHE_URL", "redis://localhost:6379/0"), socket_timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ Could not open the {backend} shared cache, caching per process: {e}")
+            store = None
+        return SharedCache(
+            store,
+            ttl=float(os.getenv("SHARED_CACHE_TTL", "3600")),
+            retry_after=float(os.getenv("SHARED_CACHE_RETRY_AFTER", "30"))
+        )
+
+    def build_embedder(self):
+        embedder = JinaEmbeddings(
+            max_cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+            shared=self.shared_cache
+        )
+        if self.micro_batching:
+            return BatchingEmbedder(embedder, self.batch_max_size, self.batch_max_wait_ms)
+        return embedder
+
+    def build_cache(self):
+        cache = Cache(embedder=self.embedder)
+        # WRITE_BEHIND takes semantic cache writes off the request path
+        if os.getenv("WRITE_BEHIND", "true").lower() == "true":
+            return WriteBehindCache(
+                cache,
+                batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "64")),
+                max_pending=int(os.getenv("WRITE_BEHIND_MAX_PENDING", "1000"))
+            )
+        return cache
+
+    def build_parent_store(self):
+        # Vectors and cache entries carry only parent_id; parents come from here
+        return ParentStore(path=os.getenv("PARENT_STORE_PATH", "json_data/parents.db"))
+
+    def build_table_index(self):
+        path = os.getenv("TABLE_INDEX_PARENTS", "json_data/parent.jsonl")
+        if not os.path.exists(path):
+            print(f"⚠️ {path} not found, the table fast path is disabled.")
+            return None
+        return TableIndex(read_jsonl(path), max_unexplained=int(os.getenv("TABLE_MAX_UNEXPLAINED", "0")))
+
+    def build_retriever(self):
+        # RETRIEVAL_BACKEND=local answers from the in-process NumPy index;
+        # only the chosen backend's client is imported
+        backend = os.getenv("RETRIEVAL_BACKEND", "pinecone").lower()
+        if backend == "local":
+            from local_index import RetrieveLocal
+            dense = RetrieveLocal(embedder=self.embedder)
+        elif backend == "pinecone":
+            from retrieval import RetrievePinecone
+            dense = RetrievePinecone(embedder=self.embedder)   # <-- Jina embeddings assumed
+        else:
+            raise ValueError(f"❌ Unknown RETRIEVAL_BACKEND '{backend}' (expected 'pinecone' or 'local').")
+
+        if self.micro_batching:
+            dense = BatchingRetriever(dense, self.batch_max_size, self.batch_max_wait_ms)
+
+        # HYBRID_RETRIEVAL fuses BM25 over the local child chunks with dense search
+        retriever = dense
+        if os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true":
+            retriever = HybridRetriever(dense, top_k=int(os.getenv("RETRIEVAL_TOP_K", "10")))
+        if self.shared_cache is not None:
+            retriever = SharedRetriever(retriever, self.shared_cache)
+        return retriever
+
+    # -------------------------------
+    # Exact-Match Answer Cache
+    # -------------------------------
+    def lookup_answer(self, state: ChatState):
+        answer = self.answer_cache.get(state["query"])
+        if answer is None:
+            return {"cache_tier": "miss"}
+        return {"answer": answer, "cache_tier": "exact_answer"}
+
+    async def alookup_answer(self, state: ChatState):
+        answer = await self.answer_cache.aget(state["query"])
+        if answer is None:
+            return {"cache_tier": "miss"}
+        return {"answer": answer, "cache_tier": "exact_answer"}
+
+    def route_after_lookup(self, state: ChatState):
+        if state["cache_tier"] == "exact_answer":
+            return END
+        return "lookup_table" if self.table_index is not None else "embed_query"
+
+    # -------------------------------
+    # Table Fast Path
+    # -------------------------------
+    def lookup_table(self, state: ChatState):
+        # Anything the index cannot pin to one row and column goes on to retrieval
+        match = self.table_index.lookup(state["query"])
+        if match is None:
+            return {}
+        return {
+            "answer": match["answer"],
+            "parent_ids": [match["parent_id"]],
+            "retrieved_text": "",
+            "retrieved_tables": [match["row"]],
+            "cache_tier": "table_answer"
+        }
+
+    async def alookup_table(self, state: ChatState):
+        return self.lookup_table(state)
+
+    def route_after_table(self, state: ChatState):
+        return END if state["cache_tier"] == "table_answer" else "embed_query"
+
+    # -------------------------------
+    # Query Embedding
+    # -------------------------------
+    def embed_query(self, state: ChatState):
+        return {"query_embedding": self.embedder.embed(state["query"])}
+
+    async def aembed_query(self, state: ChatState):
+        return {"query_embedding": await self.embedder.aembed(state["query"])}
+
     # -------------------------------
     # Document Retrieval
     # -------------------------------
+    def _resolve_parent(self, parent_id, metadata=None):
+        parent = self.parent_store.get(parent_id) if parent_id else None
+        if parent is not None or metadata is None or "parent_text" not in metadata:
+            return parent
+
+        # Vectors and cache entries written before the parent store carried the parent inline
+        tables = metadata.get("parent_tables", [])
+        if isinstance(tables, str):
+            tables = json.loads(tables)
+        return {"parent_id": parent_id, "title": "", "text": metadata["parent_text"], "tables": tables}
+
+    def _layout(self, parents):
+        # The top parent is always kept; lower-ranked ones only while they fit the budget
+        selected = []
+        used = 0
+        for parent in parents:
+            size = len(parent["text"]) + len(json.dumps(parent["tables"], ensure_ascii=False))
+            if selected and used + size > self.context_char_budget:
+                continue
+            selected.append(parent)
+            used += size
+
+        if len(selected) <= 1:
+            parent = selected[0] if selected else {"parent_id": None, "text": "", "tables": []}
+            text, tables = parent["text"], parent["tables"]
+        else:
+            text = "\n\n".join(f"### {p['title']}\n{p['text']}" for p in selected if p["text"])
+            tables = [{"page": p["title"], "rows": p["tables"]} for p in selected if p["tables"]]
+
+        return {
+            "parent_ids": [p["parent_id"] for p in selected if p["parent_id"]],
+            "retrieved_text": text,
+            "retrieved_tables": tables
+        }
+
+    def _prompt_tokens(self, query, context, full):
+        # The prompt is formatted once; the uncompacted one differs only in
+        # the length of its inputs
+        inputs = self._answer_inputs({"query": query, **context})
+        chars = len(self.prompt.format(**inputs))
+        if full is not context:
+            full_inputs = self._answer_inputs({"query": query, **full})
+            return tokens_for_length(chars), tokens_for_length(
+                chars + sum(map(len, full_inputs.values())) - sum(map(len, inputs.values()))
+            )
+        return tokens_for_length(chars), tokens_for_length(chars)
+
+    def _assemble_context(self, query, parents, matched=None):
+        parents = parents[:self.max_context_parents]
+        full = self._layout(parents)
+        context = full
+        if self.compaction:
+            # Keep only the sentences and rows relevant to the query
+            context = self._layout(compact(query, parents, matched, self.context_token_budget))
+
+        context["prompt_tokens"], context["prompt_tokens_full"] = self._prompt_tokens(query, context, full)
+        return context
+
+    def _parse_retrieval(self, query, retriever_result):
+        # Deduplicate matches by parent, keeping the best-ranked child of each;
+        # every matched chunk is kept to anchor context compaction
+        parents = []
+        matched = {}
+        for match in retriever_result.get("matches", []):
+            parent_id = match["metadata"].get("parent_id")
+            if parent_id not in matched:
+                matched[parent_id] = []
+                parent = self._resolve_parent(parent_id, match["metadata"])
+                if parent is not None:
+                    parents.append(parent)
+                else:
+                    print(f"⚠️ Parent {parent_id} is not in the parent store; its chunks are left out of the context.")
+            if "original_data" in match["metadata"]:
+                matched[parent_id].append(json.loads(match["metadata"]["original_data"]))
+
+        return {**self._assemble_context(query, parents, matched), "cache_tier": "retrieval"}
+
+    def _use_cached(self, query, doc):
+        metadata = doc[0].metadata
+        answer = metadata.get("answer")
+        if answer and (metadata.get("score", 0) >= self.answer_threshold or budget_low(self.llm_reserve)):
+            # Near-identical question already answered, or no time left for
+            # the LLM and a similar question's answer is the best on offer
+            near_identical = metadata.get("score", 0) >= self.answer_threshold
+            return {
+                "parent_ids": metadata.get("parent_ids", []),
+                "retrieved_text": "",
+                "retrieved_tables": [],
+                "answer": answer,
+                "cache_tier": "semantic_answer" if near_identical else "degraded_answer"
+            }
+
+        parent_ids = metadata.get("parent_ids") or [None]
+        parents = [self._resolve_parent(parent_id, metadata) for parent_id in parent_ids]
+        parents = [p for p in parents if p is not None]
+        return {**self._assemble_context(query, parents), "cache_tier": "semantic_context"}
+
     def retrieve_doc(self, state: ChatState):
         query = state["query"]
+        query_embedding = state["query_embedding"]
         
         # Try cache first
-        doc = self.cache.get(query)
-        
-        if doc is None:
-            # Retrieve using Pinecone retriever
-            retriever_result = self.retriever.get(query)
-            
-            # Check if Pinecone returned matches
-            matches = getattr(retriever_result, "matches", [])
-            if not matches:
-                text = ""
-                tables = []
-            else:
-                top_match = matches[0]
-                text = top_match.metadata.get("parent_text", "")
-                tables = top_match.metadata.get("parent_tables", [])
-                # Add to cache for next time
-                self.cache.add(query=query, parent_text=text, parent_tables=tables)
-        else:
-            text = doc[0].metadata.get("parent_text", "")
-            tables = doc[0].metadata.get("parent_tables", [])
+        doc = self.cache.get(query, query_embedding)
+        if doc is not None:
+            return self._use_cached(query, doc)
 
-        return {"retrieved_text": text, "retrieved_tables": tables}
+        # Retrieve using the configured vector index
+        return self._parse_retrieval(query, self.retriever.get(query, query_embedding))
 
+    async def aretrieve_doc(self, state: ChatState):
+        query = state["query"]
+        query_embedding = state["query_embedding"]
 
+        doc = await self.cache.aget(query, query_embedding)
+        if doc is not None:
+            return await asyncio.to_thread(self._use_cached, query, doc)
 
+        result = await self.retriever.aget(query, query_embedding)
+        return await asyncio.to_thread(self._parse_retrieval, query, result)
+
+    # -------------------------------
+    # Speculative Retrieval
+    # -------------------------------
+    def lookup_cache(self, state: ChatState):
+        return {"cache_match": self.cache.get(state["query"], state["query_embedding"])}
+
+    async def alookup_cache(self, state: ChatState):
+        doc = await self.cache.aget(state["query"], state["query_embedding"])
+        if doc is not None:
+            state["cache_hit"].set()
+        return {"cache_match": doc}
+
+    def search_index(self, state: ChatState):
+        return {"index_result": self.retriever.get(state["query"], state["query_embedding"])}
+
+    async def asearch_index(self, state: ChatState):
+        # Gives up on the search as soon as the cache branch has a hit
+        search = asyncio.ensure_future(self.retriever.aget(state["query"], state["query_embedding"]))
+        hit = asyncio.ensure_future(state["cache_hit"].wait())
+        try:
+            await asyncio.wait({search, hit}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            hit.cancel()
+        if not search.done():
+            search.cancel()
+            return {"index_result": None}
+        return {"index_result": search.result()}
+
+    def join_retrieval(self, state: ChatState):
+        # The cache wins whenever it cleared its threshold
+        if state.get("cache_match") is not None:
+            return self._use_cached(state["query"], state["cache_match"])
+        return self._parse_retrieval(state["query"], state["index_result"])
+
+    async def ajoin_retrieval(self, state: ChatState):
+        # Parent lookups and compaction are CPU and SQLite work; off the loop,
+        # so concurrent requests keep moving
+        return await asyncio.to_thread(self.join_retrieval, state)
+
+    def route_after_retrieval(self, state: ChatState):
+        return "store_answer" if state["cache_tier"] in ("semantic_answer", "degraded_answer") else "get_answer"
 
     # -------------------------------
     # Answer Generation
     # -------------------------------
-    def get_answer(self, state: ChatState):
-        query = state['query']
-        parent_text = state["retrieved_text"]
-        parent_tables = state["retrieved_tables"]
+    def _answer_inputs(self, state: ChatState):
+        return {
+            "query": state["query"],
+            "parent_text": state["retrieved_text"],
+            "parent_tables": json.dumps(state["retrieved_tables"], ensure_ascii=False)
+        }
 
-        prompt = PromptTemplate(
-            input_variables=["query", "parent_text", "parent_tables"],
-            template="""
-                You are a helpful assistant. Use the given **text** and **table rows** to answer questions. 
-                Question : {query}
+    def _is_rate_limited(self, e: Exception):
+        return "429" in str(e) or "quota" in str(e).lower()
 
-                (NOTE: TABLES AND ROWS data may and may not exist.)
+    def _estimated_tokens(self, inputs):
+        return estimate_tokens(self.prompt.format(**inputs)) + self.completion_tokens
 
-                --- Parent Text ---
-                {parent_text}
+    def _check_llm_budget(self, delay=0.0):
+        # Fail fast rather than start an LLM call the deadline will cut off
+        if budget_low(self.llm_reserve + delay):
+            raise expire("get_answer")
 
-                --- Parent Tables (rows as JSON) ---
-                {parent_tables}
+    def get_answer(self, state: ChatState):
+        inputs = self._answer_inputs(state)
+        tokens = self._estimated_tokens(inputs)
 
-                Based on both the text and the tables, give a clear and concise response.
+        for attempt in range(self.llm_attempts):
+            self._check_llm_budget()
+            key = self.key_manager.acquire(tokens)
+            chain = self.prompt | key.model | self.str_parser
+            try:
+                with span("groq.chat"):
+                    return {"answer": chain.invoke(inputs)}
+            except Exception as e:
+                if not self._is_rate_limited(e) or attempt == self.llm_attempts - 1:
+                    raise e
+                LLM_RETRIES.inc()
+                # The 429 has already parked that key; back off and take another
+                print(f"🔄 Rate limited on {key.label}, retrying on another key...")
+                delay = self.key_manager.backoff(attempt)
+                self._check_llm_budget(delay)
+                time.sleep(delay)
 
-                Only reply with the answer and nothing else.
-            """
-        )
+    async def aget_answer(self, state: ChatState):
+        inputs = self._answer_inputs(state)
+        tokens = self._estimated_tokens(inputs)
 
-        chain = prompt | self.model | self.str_parser
+        for attempt in range(self.llm_attempts):
+            self._check_llm_budget()
+            key = await self.key_manager.aacquire(tokens)
+            chain = self.prompt | key.model | self.str_parser
+            try:
+                with span("groq.chat"):
+                    return {"answer": await chain.ainvoke(inputs)}
+            except Exception as e:
+                if not self._is_rate_limited(e) or attempt == self.llm_attempts - 1:
+                    raise e
+                LLM_RETRIES.inc()
+                print(f"🔄 Rate limited on {key.label}, retrying on another key...")
+                delay = self.key_manager.backoff(attempt)
+                self._check_llm_budget(delay)
+                await asyncio.sleep(delay)
 
-        try:
-            answer = chain.invoke({
-                "query": query,
-                "parent_text": parent_text,
-                "parent_tables": parent_tables
-            })
-        except Exception as e:
-            if "429" in str(e) or "quota" in str(e).lower():
-                # rotate key + retry
-                self.model = self.key_manager.rotate_key()
-                chain = prompt | self.model | self.str_parser
-                answer = chain.invoke({
-                    "query": query,
-                    "parent_text": parent_text,
-                    "parent_tables": parent_tables
-                })
-            else:
-                raise e
+    # -------------------------------
+    # Cache Population
+    # -------------------------------
+    def _should_add_to_cache(self, state: ChatState):
+        # Only freshly generated answers go to the semantic cache
+        if state["cache_tier"] in ("semantic_answer", "degraded_answer") or not state.get("parent_ids"):
+            return False
+        # A queued write costs the request nothing; a direct one is skipped
+        # when the deadline is close
+        if budget_low(self.write_reserve) and not isinstance(self.cache, WriteBehindCache):
+            CACHE_WRITES_SKIPPED.inc()
+            return False
+        return True
 
-        return {"answer": answer}
+    def _answer_cacheable(self, state: ChatState):
+        # A degraded answer was given to a different question; it must not
+        # become this query's exact-match answer
+        return state["cache_tier"] != "degraded_answer"
+
+    def store_answer(self, state: ChatState):
+        if self._answer_cacheable(state):
+            self.answer_cache.put(state["query"], state["answer"])
+        if self._should_add_to_cache(state):
+            self.cache.add(
+                query=state["query"],
+                parent_ids=state["parent_ids"],
+                query_embedding=state["query_embedding"],
+                answer=state["answer"]
+            )
+        return {}
+
+    async def astore_answer(self, state: ChatState):
+        if self._answer_cacheable(state):
+            await self.answer_cache.aput(state["query"], state["answer"])
+        if self._should_add_to_cache(state):
+            await self.cache.aadd(
+                query=state["query"],
+                parent_ids=state["parent_ids"],
+                query_embedding=state["query_embedding"],
+                answer=state["answer"]
+            )
+        return {}
 
     # -------------------------------
     # Graph Construction
     # -------------------------------
     def graph_building(self):
         builder = StateGraph(ChatState)
-        builder.add_node(self.retrieve_doc)
-        builder.add_node(self.get_answer)
+        # Each node carries a sync and an async implementation so the same
+        # graph serves both invoke() and ainvoke()
+        nodes = [
+            ("lookup_answer", self.lookup_answer, self.alookup_answer),
+            ("embed_query", self.embed_query, self.aembed_query),
+            ("get_answer", self.get_answer, self.aget_answer),
+            ("store_answer", self.store_answer, self.astore_answer),
+        ]
+        if self.table_index is not None:
+            nodes.append(("lookup_table", self.lookup_table, self.alookup_table))
+        if self.retrieval_mode == "speculative":
+            # retrieve_doc is the join of the two concurrent branches
+            nodes += [
+                ("lookup_cache", self.lookup_cache, self.alookup_cache),
+                ("search_index", self.search_index, self.asearch_index),
+                ("retrieve_doc", self.join_retrieval, self.ajoin_retrieval),
+            ]
+        else:
+            nodes.append(("retrieve_doc", self.retrieve_doc, self.aretrieve_doc))
+
+        for name, func, afunc in nodes:
+            # Every node is timed into the stage histogram and Server-Timing
+            # and runs within what is left of the request deadline
+            builder.add_node(name, RunnableLambda(
+                timed(name, checked(name, func)), afunc=atimed(name, bounded(name, afunc))
+            ))
 
-        builder.add_edge(START, "retrieve_doc")
-        builder.add_edge("retrieve_doc", "get_answer")
-        builder.add_edge("get_answer", END)
+        builder.add_edge(START, "lookup_answer")
+        if self.table_index is not None:
+            builder.add_conditional_edges("lookup_answer", self.route_after_lookup, ["lookup_table", END])
+            builder.add_conditional_edges("lookup_table", self.route_after_table, ["embed_query", END])
+        else:
+            builder.add_conditional_edges("lookup_answer", self.route_after_lookup, ["embed_query", END])
+        if self.retrieval_mode == "speculative":
+            builder.add_edge("embed_query", "lookup_cache")
+            builder.add_edge("embed_query", "search_index")
+            builder.add_edge(["lookup_cache", "search_index"], "retrieve_doc")
+        else:
+            builder.add_edge("embed_query", "retrieve_doc")
+        builder.add_conditional_edges("retrieve_doc", self.route_after_retrieval, ["get_answer", "store_answer"])
+        builder.add_edge("get_answer", "store_answer")
+        builder.add_edge("store_answer", END)
 
         return builder.compile()
 
     # -------------------------------
     # Entry Point
     # -------------------------------
+    def _init_state(self, query):
+        if self.retrieval_mode == "speculative":
+            return {"query": query, "cache_hit": asyncio.Event()}
+        return {"query": query}
+
+    def run(self, query):
+        return self.graph.invoke(self._init_state(query))
+
+    async def arun(self, query):
+        init_state = self._init_state(query)
+        # The shared run follows its first caller's deadline; callers that join
+        # it still give up at their own
+        return await bounded("request", self.single_flight.do)(
+            normalize_query(query), lambda: self.graph.ainvoke(init_state)
+        )
+
+    async def abatch(self, queries, concurrency=None):
+        """
+        Answers a list of queries through the normal graph, so every answer
+        lands in the caches. Duplicates (after normalization) run once, the
+        distinct queries not already in the answer cache are embedded in one
+        request up front, and at most `concurrency` queries run at a time.
+        Yields one result per input query, in input order, as soon as it and
+        every query before it are done; a failed query yields its exception
+        under "error" instead of failing the batch.
+        """
+        unique = {}
+        for query in queries:
+            unique.setdefault(normalize_query(query), query)
+
+        # Warms the embedding LRU, so embed_query finds every vector locally
+        to_embed = [query for query in unique.values() if not await self.answer_cache.acontains(query)]
+        if to_embed:
+            try:
+                with span("embed_batch"):
+                    await self.embedder.aembed_queries(to_embed)
+            except Exception as e:
+                # Each query falls back to embedding on its own
+                print(f"⚠️ Batch embedding failed: {e}")
+
+        semaphore = asyncio.Semaphore(concurrency or self.batch_query_concurrency)
+
+        async def answer(query):
+            async with semaphore:
+                return await self.arun(query)
+
+        tasks = {key: asyncio.ensure_future(answer(query)) for key, query in unique.items()}
+        try:
+            for query in queries:
+                try:
+                    # Duplicates share a result but keep their own spelling
+                    yield {**await tasks[normalize_query(query)], "query": query}
+                except Exception as e:
+                    yield {"query": query, "error": e}
+        finally:
+            # The caller stopped reading: drop the queries not yet answered
+            for task in tasks.values():
+                task.cancel()
+
     def invoke(self, query):
-        init_state = {"query": query}
-        return self.graph.invoke(init_state)["answer"]
+        return self.run(query)["answer"]
+
+    async def ainvoke(self, query):
+        return (await self.arun(query))["answer"]
+
+    async def astream(self, query):
+        # Yields answer tokens as the LLM produces them, then a final "done"
+        # event once the graph (including the cache write) has finished
+        init_state = self._init_state(query)
+        start = time.perf_counter()
+        ttft_ms = None
+        final_state = {}
+
+        async for mode, chunk in self.graph.astream(init_state, stream_mode=["messages", "values"]):
+            if mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") == "get_answer" and message.content:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                        TTFT_SECONDS.observe(ttft_ms / 1000)
+                    yield {"type": "token", "content": message.content}
+            else:
+                final_state = chunk
+
+        if ttft_ms is None:
+            # Served from a cache tier: the whole answer is the first token
+            ttft_ms = (time.perf_counter() - start) * 1000
+            TTFT_SECONDS.observe(ttft_ms / 1000)
+            yield {"type": "token", "content": final_state.get("answer", "")}
+
+        yield {
+            "type": "done",
+            "cache_tier": final_state.get("cache_tier"),
+            "prompt_tokens": final_state.get("prompt_tokens"),
+            "prompt_tokens_full": final_state.get("prompt_tokens_full"),
+            "ttft_ms": round(ttft_ms, 1),
+            "total_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    def stats(self):
+        return {
+            "single_flight": self.single_flight.stats(),
+            "answer_cache": self.answer_cache.stats(),
+            "cache_writes": self.cache.stats() if isinstance(self.cache, WriteBehindCache) else None,
+            "shared_cache": self.shared_cache.stats() if self.shared_cache is not None else None,
+            "table_index": self.table_index.stats() if self.table_index is not None else None,
+            "groq_keys": self.key_manager.stats()
+        }
 
+    async def aclose(self):
+        # Queued cache writes are flushed before the stores close
+        await self.cache.aclose()
+        await self.retriever.aclose()
+        await self.embedder.aclose()
+        if self.shared_cache is not None:
+            self.shared_cache.close()
@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from cachetools import TLRUCache
+from embeddings import normalize_query
+from metrics import counter
+
+SHARED_CACHE_REQUESTS = counter(
+    "airac_shared_cache_requests_total", "Shared cache lookups.", ["namespace", "result"]
+)
+SHARED_CACHE_ERRORS = counter(
+    "airac_shared_cache_errors_total", "Shared cache operations that failed and used the per-process fallback."
+)
+
+
+def default_path():
+    # /dev/shm keeps the database in memory while every worker on the host can open it
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "airac_shared_cache.db")
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+# A backend stores bytes under string keys with get(key) and add(key, value, ttl),
+# which inserts atomically only if the key is absent or expired and reports
+# whether it did. MemoryBackend implements the same interface in process, for
+# tests and as the fallback.
+class MemoryBackend:
+    def __init__(self, max_size: int = 4096):
+        # Each entry carries its own TTL
+        self.entries = TLRUCache(maxsize=max_size, ttu=lambda key, value, now: now + value[0])
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+        return None if entry is None else entry[1]
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self.lock:
+            if key in self.entries:
+                return False
+            self.entries[key] = (ttl, value)
+            return True
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """
+    Host-wide cache in a SQLite database in WAL mode, so readers in every
+    worker run alongside a writer. Expired rows are ignored on read and
+    deleted every `purge_interval` seconds.
+    """
+
+    def __init__(self, path: str = None, busy_timeout: float = 0.1, purge_interval: float = 60):
+        self.path = path or default_path()
+        self.busy_timeout = busy_timeout
+        self.purge_interval = purge_interval
+        self.lock = threading.Lock()
+        self.conn = None
+        self.pid = None
+        self.next_purge = 0.0
+        self._connect()
+
+    def _connect(self):
+        # A connection must not cross a fork, so each process opens its own
+        self.conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Cache entries can be recomputed, so nothing is fsynced
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)"
+        )
+        self.pid = os.getpid()
+
+    def _conn(self):
+        if self.pid != os.getpid():
+            self._connect()
+        return self.conn
+
+    def get(self, key: str):
+        with self.lock:
+            row = self._conn().execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.time()
+        with self.lock:
+            conn = self._conn()
+            # One statement, so concurrent writers cannot both win
+            inserted = conn.execute(
+                "INSERT INTO entries (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+                "WHERE entries.expires_at <= ?",
+                (key, value, now + ttl, now)
+            ).rowcount > 0
+            if now >= self.next_purge:
+                self.next_purge = now + self.purge_interval
+                conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        return inserted
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None and self.pid == os.getpid():
+                self.conn.close()
+            self.conn = None
+
+
+class RedisBackend:
+    """Cache on a Redis-protocol server (Redis, Valkey, KeyDB...) shared by every worker."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", socket_timeout: float = 0.1):
+        # Optional dependency, only needed for SHARED_CACHE_BACKEND=redis
+        import redis
+
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout
+        )
+        self.client.ping()
+
+    def get(self, key: str):
+        return self.client.get(key)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(self.client.set(key, value, px=max(int(ttl * 1000), 1), nx=True))
+
+    def close(self):
+        self.client.close()
+
+
+# -------------------------------
+# Shared cache
+# -------------------------------
+class SharedCache:
+    """
+    Cache shared by every worker process on the host, for query embeddings,
+    index results and answers. Values are stored as JSON under a hash of
+    namespace and key. When the backend fails, or could not be opened
+    (`backend=None`), entries go to a per-process MemoryBackend instead and
+    the backend is tried again after `retry_after` seconds. The a-prefixed
+    methods run backend calls in a worker thread, off the event loop.
+    """
+
+    def __init__(self, backend, ttl: float = 3600, fallback_size: int = 4096, retry_after: float = 30):
+        self.backend = backend
+        self.ttl = ttl
+        self.fallback = MemoryBackend(fallback_size)
+        self.retry_after = retry_after
+        self.down_until = 0.0
+        self.counts = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"airac:{namespace}:{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}"
+
+    def available(self) -> bool:
+        return self.backend is not None and time.monotonic() >= self.down_until
+
+    def _fail(self, e):
+        if self.available():
+            print(f"⚠️ Shared cache unavailable, using the per-process cache for {self.retry_after:.0f}s: {e}")
+        self.down_until = time.monotonic() + self.retry_after
+        self.counts["errors"] += 1
+        SHARED_CACHE_ERRORS.inc()
+
+    def _call(self, method, *args):
+        if self.available():
+            try:
+                return getattr(self.backend, method)(*args)
+            except Exception as e:
+                self._fail(e)
+        return getattr(self.fallback, method)(*args)
+
+    async def _acall(self, method, *args):
+        # The in-process fallback is cheap enough to call on the loop
+        if not self.available():
+            return getattr(self.fallback, method)(*args)
+        return await asyncio.to_thread(self._call, method, *args)
+
+    def _decode(self, namespace: str, value):
+        self.counts["misses" if value is None else "hits"] += 1
+        SHARED_CACHE_REQUESTS.inc(namespace=namespace, result="miss" if value is None else "hit")
+        return None if value is None else json.loads(value)
+
+    def _encode(self, value) -> bytes:
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    def _added(self, inserted: bool) -> bool:
+        # The first writer of a key wins; later adds are no-ops until it expires
+        if inserted:
+            self.counts["writes"] += 1
+        return inserted
+
+    def contains(self, namespace: str, key: str) -> bool:
+        return self._call("get", self._key(namespace, key)) is not None
+
+    async def acontains(self, namespace: str, key: str) -> bool:
+        return await self._acall("get", self._key(namespace, key)) is not None
+
+    def get(self, namespace: str, key: str):
+        return self._decode(namespace, self._call("get", self._key(namespace, key)))
+
+    async def aget(self, namespace: str, key: str):
+        return self._decode(namespace, await self._acall("get", self._key(namespace, key)))
+
+    def add(self, namespace: str, key: str, value, ttl: float = None) -> bool:
+        return self._added(self._call(
+            "add", self._key(namespace, key), self._encode(value), self.ttl if ttl is None else ttl
+        ))
+
+    async def aadd(self, namespace: str, key: str, value, ttl: float = None) -> bool:
+        return self._added(await self._acall(
+            "add", self._key(namespace, key), self._encode(value), self.ttl if ttl is None else ttl
+        ))
+
+    def stats(self):
+        backend = type(self.backend).__name__ if self.backend is not None else None
+        return {"backend": backend, "available": self.available(), **self.counts}
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+
+class SharedRetriever:
+    """Index results shared across workers, keyed by the normalized query."""
+
+    def __init__(self, retriever, shared: SharedCache, ttl: float = None):
+        self.retriever = retriever
+        self.shared = shared
+        self.ttl = ttl
+
+    @staticmethod
+    def _plain(result):
+        # Pinecone responses are objects; only what _parse_retrieval reads is kept
+        return {"matches": [
+            {"id": match["id"], "score": float(match["score"]), "metadata": dict(match["metadata"])}
+            for match in result.get("matches", [])
+        ]}
+
+    def get(self, query, query_embedding=None):
+        key = normalize_query(query)
+        result = self.shared.get("retrieval", key)
+        if result is None:
+            result = self.retriever.get(query, query_embedding)
+            self.shared.add("retrieval", key, self._plain(result), self.ttl)
+        return result
+
+    async def aget(self, query, query_embedding=None):
+        key = normalize_query(query)
+        result = await self.shared.aget("retrieval", key)
+        if result is None:
+            result = await self.retriever.aget(query, query_embedding)
+            await self.shared.aadd("retrieval", key, self._plain(result), self.ttl)
+        return result
+
+    async def aclose(self):
+        await self.retriever.aclose()
@@ -0,0 +1,50 @@
+import asyncio
+from metrics import counter
+
+DEDUPLICATED = counter(
+    "airac_single_flight_deduplicated_total", "Requests that joined an identical in-flight query."
+)
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution: the first caller
+    starts it and later callers attach to it until it finishes. Every caller
+    gets the same result or the same exception. The execution runs as its own
+    task, so one caller disconnecting does not cancel it for the others; it is
+    cancelled only once every caller has gone.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.deduplicated = 0
+
+    async def do(self, key, fn):
+        call = self.calls.get(key)
+        if call is None:
+            call = {"task": asyncio.ensure_future(fn()), "waiters": 0}
+            self.calls[key] = call
+
+            def forget(_):
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+
+            call["task"].add_done_callback(forget)
+        else:
+            self.deduplicated += 1
+            DEDUPLICATED.inc()
+
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        finally:
+            call["waiters"] -= 1
+            if call["waiters"] == 0 and not call["task"].done():
+                # Forgotten right away, so a new caller starts afresh instead
+                # of joining an execution that is being cancelled
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+                call["task"].cancel()
+
+    def stats(self):
+        return {"deduplicated": self.deduplicated, "in_flight": len(self.calls)}
@@ -0,0 +1,231 @@
+import re
+import math
+from collections import defaultdict
+from hybrid import tokenize
+from metrics import counter
+
+TABLE_LOOKUPS = counter(
+    "airac_table_lookups_total", "Table fast-path lookups by outcome.", ["result"]
+)
+
+# Spellings that should meet in the index
+ALIASES = {"percentage": "percent", "semester": "sem", "phone": "contact", "mobile": "contact"}
+# Row numbering carries no meaning and is neither matched nor answered
+SERIAL_COLUMN = re.compile(r"^\s*s(r|l)\.?\s*no\.?\s*$", re.IGNORECASE)
+DATE_OR_TIME = re.compile(
+    r"\d{1,2}[.:/]\d{1,2}|\d(st|nd|rd|th)\b|\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b|\b[ap]\.?m\b",
+    re.IGNORECASE,
+)
+# A row holds one current value per column, so questions that negate or move
+# it in time go to the LLM. Matched on the raw words, since hybrid drops
+# several of them as stopwords
+FALLBACK_WORDS = {
+    "not", "no", "never", "without", "except", "isn", "aren", "don", "doesn", "didn", "nor", "other", "besides",
+    "was", "were", "will", "previous", "previously", "former", "formerly", "last", "next", "upcoming",
+    "past", "old", "new", "current", "currently", "earlier", "later", "before", "after", "ago",
+    "today", "tomorrow", "yesterday", "tonight", "now",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "sundays",
+    "weekday", "weekdays", "weekend", "weekends", "holiday", "holidays", "vacation", "vacations",
+}
+
+
+def terms(text: str) -> list[str]:
+    # hybrid.tokenize plus aliases and a plural "s" dropped
+    words = []
+    for token in tokenize(str(text)):
+        token = ALIASES.get(token, token)
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        words.append(token)
+    return words
+
+
+def column_terms(column: str) -> set[str]:
+    # "Total Placed %" answers "placement percentage"
+    return set(terms(column.replace("%", " percent ")))
+
+
+def flatten(row: dict, prefix: str = "") -> dict:
+    # Nested cells such as {"Double Seater": ..., "Four Seater": ...} become
+    # columns named "outer / inner"
+    cells = {}
+    for column, value in row.items():
+        name = f"{prefix} / {column}" if prefix else str(column)
+        if isinstance(value, dict):
+            cells.update(flatten(value, name))
+        elif value not in (None, ""):
+            cells[name] = str(value)
+    return cells
+
+
+class TableIndex:
+    """
+    In-memory index over the rows of every parent's `tables`, with inverted
+    indexes from terms to the cells and the column names they occur in.
+
+    lookup() answers a question only when it names exactly one row (by every
+    term of one of its cells) and one column (by name, by "when"/"who", or as the only
+    column left), leaves at most `max_unexplained` query terms unmatched by
+    the row, the table's columns or its title, and has none of FALLBACK_WORDS.
+    Anything else returns None.
+    """
+
+    def __init__(self, parents, max_unexplained: int = 0):
+        self.max_unexplained = max_unexplained
+        self.answered = 0
+        self.fallthrough = 0
+        self.tables = []
+        # term -> {(table, row, column)} and term -> {(table, column)}
+        self.cell_terms = defaultdict(set)
+        self.column_terms = defaultdict(set)
+
+        for parent in parents:
+            rows = [flatten(row) for row in parent.get("tables", []) if isinstance(row, dict)]
+            if not rows:
+                continue
+            t = len(self.tables)
+            columns = list(dict.fromkeys(column for row in rows for column in row))
+            columns = [column for column in columns if not SERIAL_COLUMN.match(column)]
+            self.tables.append({
+                "parent_id": parent["parent_id"],
+                "title": parent.get("title", ""),
+                "title_terms": set(terms(parent.get("title", ""))),
+                "columns": columns,
+                "rows": rows,
+            })
+            for column in columns:
+                for term in column_terms(column):
+                    self.column_terms[term].add((t, column))
+            for r, row in enumerate(rows):
+                for column in columns:
+                    for term in terms(row.get(column, "")):
+                        self.cell_terms[term].add((t, r, column))
+
+        self.size = sum(len(table["rows"]) for table in self.tables)
+        # Rarer terms identify a row better: "IFSC code" is the IFSC row, not "Bank Code"
+        cells = max(sum(len(entries) for entries in self.cell_terms.values()), 1)
+        self.idf = {term: math.log(cells / len(entries)) for term, entries in self.cell_terms.items()}
+
+    # -------------------------------
+    # Row and column resolution
+    # -------------------------------
+    def _best_row(self, query_terms):
+        # Matched query terms per row, split by the cell they were found in
+        hits = defaultdict(lambda: defaultdict(set))
+        for term in query_terms:
+            for t, r, column in self.cell_terms.get(term, ()):
+                hits[(t, r)][column].add(term)
+        if not hits:
+            return None
+
+        def score(key):
+            t, r = key
+            row = self.tables[t]["rows"][r]
+            matched = set().union(*hits[key].values())
+            # Share of its own terms the query covers in the best-matched
+            # cell, so "admission in-charge" prefers "Admission In-Charge"
+            # over "Admission Co-In-Charge", and a stray match in another cell
+            # ("Bank" in the Information column) does not dilute it
+            coverage = max(
+                len(matched_terms & set(terms(row[column]))) / len(set(terms(row[column])))
+                for column, matched_terms in hits[key].items()
+            )
+            return (len(matched), coverage, sum(self.idf[term] for term in matched))
+
+        ranked = sorted(hits, key=score, reverse=True)
+        best = score(ranked[0])
+        # A cell only half named ("bank account" for "Name of the Bank
+        # Account") may well be a different row, so it goes to the LLM
+        if best[1] < 1 or (len(ranked) > 1 and score(ranked[1]) == best):
+            return None
+        t, r = ranked[0]
+        # A column whose matches another column already covers, such as
+        # "bank" in "State Bank of India" next to "Name of the Bank", does
+        # not identify the row and stays answerable
+        row_hits = hits[ranked[0]]
+        key_hits = {
+            column: matched for column, matched in row_hits.items()
+            if not any(matched < other for other in row_hits.values())
+        }
+        return t, r, key_hits
+
+    def _target_column(self, query, query_terms, t, key_columns, only_column_ok):
+        table = self.tables[t]
+        candidates = [column for column in table["columns"] if column not in key_columns]
+        if not candidates:
+            return None
+
+        # Columns named in the query, most terms first
+        overlap = {column: len(query_terms & column_terms(column)) for column in candidates}
+        most = max(overlap.values())
+        named = [column for column in candidates if most and overlap[column] == most]
+
+        # Columns implied by the question word
+        words = set(re.findall(r"[a-z]+", query.lower()))
+        rows = table["rows"]
+        hinted = []
+        if "when" in words:
+            hinted = [c for c in candidates if all(DATE_OR_TIME.search(row.get(c, "")) for row in rows if c in row)]
+        elif "who" in words:
+            hinted = [c for c in candidates if "name" in column_terms(c)]
+
+        if named and hinted:
+            # Both must agree, e.g. "when ... odd semester" -> "Odd Sem"
+            choice = [column for column in named if column in hinted]
+        else:
+            choice = named or hinted
+        if not choice and len(candidates) == 1 and only_column_ok:
+            choice = candidates
+        return choice[0] if len(choice) == 1 else None
+
+    def lookup(self, query: str):
+        result = self._resolve(query)
+        if result is None:
+            self.fallthrough += 1
+        else:
+            self.answered += 1
+        TABLE_LOOKUPS.inc(result="fallthrough" if result is None else "answered")
+        return result
+
+    def stats(self):
+        return {"rows": self.size, "answered": self.answered, "fallthrough": self.fallthrough}
+
+    def _resolve(self, query: str):
+        if FALLBACK_WORDS & set(re.findall(r"[a-z]+", query.lower())):
+            return None
+        query_terms = set(terms(query))
+        if not query_terms:
+            return None
+
+        best = self._best_row(query_terms)
+        if best is None:
+            return None
+        t, r, key_hits = best
+        table = self.tables[t]
+
+        explained = set().union(*key_hits.values()) | table["title_terms"]
+        for name in table["columns"]:
+            explained |= column_terms(name)
+        unexplained = query_terms - explained
+        if len(unexplained) > self.max_unexplained:
+            return None
+
+        # The only column left is the answer only if nothing in the query
+        # could be asking for something else
+        column = self._target_column(query, query_terms, t, set(key_hits), not unexplained)
+        if column is None:
+            return None
+
+        row = table["rows"][r]
+        value = row.get(column)
+        if value is None:
+            return None
+
+        label = ", ".join(row[c] for c in table["columns"] if c in key_hits)
+        return {
+            "answer": f"{column} for {label}: {value}",
+            "parent_id": table["parent_id"],
+            "title": table["title"],
+            "row": row,
+            "column": column,
+        }
@@ -0,0 +1,131 @@
+import asyncio
+from collections import OrderedDict
+from metrics import counter, request_timings
+from deadline import request_deadline
+
+CACHE_WRITES = counter(
+    "airac_cache_writes_total", "Semantic cache writes by outcome.", ["result"]
+)
+CACHE_WRITE_FAILURES = counter(
+    "airac_cache_write_failures_total", "Semantic cache batch writes that raised."
+)
+
+
+class WriteBehindCache:
+    """
+    Async front for the semantic cache: aadd() queues the entry and returns at
+    once, and a background task writes queued entries in batches of up to
+    `batch_size`. A write for a query that is still queued replaces it, and
+    once `max_pending` entries are queued new ones are dropped (the cache is
+    best effort). A batch that fails to write is queued again, ahead of newer
+    entries and within `max_pending`, up to `max_retries` times after
+    `retry_delay` seconds; entries past that are dropped. aclose() writes
+    whatever is queued before closing the cache. Reads and sync writes go
+    straight through.
+    """
+
+    def __init__(self, cache, batch_size: int = 64, max_pending: int = 1000,
+                 max_retries: int = 1, retry_delay: float = 1.0):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.pending = OrderedDict()
+        self.ready = None
+        self.worker = None
+        self.closing = False
+        self.counts = {"written": 0, "coalesced": 0, "dropped": 0, "batches": 0, "failures": 0}
+
+    def get(self, query, query_embedding=None):
+        return self.cache.get(query, query_embedding)
+
+    async def aget(self, query, query_embedding=None):
+        return await self.cache.aget(query, query_embedding)
+
+    def add(self, query, parent_ids, query_embedding=None, answer=None):
+        self.cache.add(query=query, parent_ids=parent_ids, query_embedding=query_embedding, answer=answer)
+
+    async def aadd(self, query, parent_ids, query_embedding=None, answer=None):
+        if query in self.pending:
+            self.counts["coalesced"] += 1
+            CACHE_WRITES.inc(result="coalesced")
+        elif len(self.pending) >= self.max_pending:
+            self.counts["dropped"] += 1
+            CACHE_WRITES.inc(result="dropped")
+            return
+
+        # Same id as the store uses, so the latest answer for a query wins
+        self.pending[query] = {
+            "query": query, "parent_ids": parent_ids, "query_embedding": query_embedding, "answer": answer,
+            "retries": 0
+        }
+        self._start()
+        self.ready.set()
+
+    def _start(self):
+        if self.worker is None or self.worker.done():
+            self.ready = asyncio.Event()
+            self.worker = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        # The task copied the context of the request that started it; its
+        # writes are not part of that request's timings or deadline
+        request_timings.set(None)
+        request_deadline.set(None)
+        # Entries queued while a batch is being written form the next batch
+        while self.pending or not self.closing:
+            if not self.pending:
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+
+            batch = [self.pending.popitem(last=False)[1] for _ in range(min(self.batch_size, len(self.pending)))]
+            try:
+                await self.cache.aadd_batch(batch)
+            except Exception as e:
+                print(f"An error occurred during cache write-behind of {len(batch)} entries: {e}")
+                self.counts["failures"] += 1
+                CACHE_WRITE_FAILURES.inc()
+                self._requeue(batch)
+                await asyncio.sleep(self.retry_delay)
+                continue
+            self.counts["written"] += len(batch)
+            self.counts["batches"] += 1
+            CACHE_WRITES.inc(len(batch), result="written")
+
+    def _requeue(self, batch):
+        # Back at the front, oldest first; a newer write for the same query
+        # queued meanwhile supersedes the failed one
+        dropped = 0
+        for entry in reversed(batch):
+            query = entry["query"]
+            if query in self.pending:
+                continue
+            if entry["retries"] >= self.max_retries or len(self.pending) >= self.max_pending:
+                dropped += 1
+                continue
+            entry["retries"] += 1
+            self.pending[query] = entry
+            self.pending.move_to_end(query, last=False)
+        if dropped:
+            print(f"⚠️ Dropped {dropped} semantic cache writes after a failed batch.")
+            self.counts["dropped"] += dropped
+            CACHE_WRITES.inc(dropped, result="dropped")
+
+    async def flush(self):
+        # Writes everything queued; later aadd() calls start a new worker
+        if self.worker is not None and not self.worker.done():
+            self.closing = True
+            self.ready.set()
+            try:
+                await self.worker
+            finally:
+                self.closing = False
+
+    def stats(self):
+        return {**self.counts, "pending": len(self.pending)}
+
+    async def aclose(self):
+        await self.flush()
+        await self.cache.aclose()
@@ -0,0 +1,116 @@
+"""
+Load check for micro-batching of query embeddings and vector searches.
+
+Fires bursts of concurrent distinct queries through the embed + retrieve path
+against stand-ins for Jina and the vector index. Each stand-in counts its
+upstream calls and, like a rate-limited provider, only serves a few calls at
+once; a call costs a fixed round-trip plus a small per-item cost. The same
+load runs with and without the coalescer in front, and the script reports
+upstream call counts and p50/p99 request latency for each.
+
+    python benchmarks/bench_batching.py --clients 64 --rounds 8 --max-wait-ms 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from batching import BatchingEmbedder, BatchingRetriever
+
+ROUND_TRIP = 0.03
+PER_ITEM = 0.0005
+UPSTREAM_CONCURRENCY = 4
+
+
+class StandInUpstream:
+    def __init__(self):
+        self.calls = 0
+        self.slots = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+
+    async def call(self, items):
+        self.calls += 1
+        async with self.slots:
+            await asyncio.sleep(ROUND_TRIP + PER_ITEM * items)
+
+
+class StandInEmbedder:
+    def __init__(self):
+        self.upstream = StandInUpstream()
+
+    async def aembed(self, text):
+        await self.upstream.call(1)
+        return [float(len(text))] * 8
+
+    async def aembed_queries(self, texts):
+        await self.upstream.call(len(texts))
+        return [[float(len(text))] * 8 for text in texts]
+
+    def stats(self):
+        return {}
+
+    async def aclose(self):
+        pass
+
+
+class StandInRetriever:
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.upstream = StandInUpstream()
+
+    async def aget(self, query, query_embedding=None, top_k=1):
+        await self.upstream.call(1)
+        return {"matches": []}
+
+    async def asearch_batch(self, query_embeddings, top_k=1):
+        await self.upstream.call(len(query_embeddings))
+        return [{"matches": []} for _ in query_embeddings]
+
+    async def aclose(self):
+        pass
+
+
+async def run_load(embedder, retriever, clients, rounds):
+    latencies = []
+
+    async def request(query):
+        start = time.perf_counter()
+        embedding = await embedder.aembed(query)
+        await retriever.aget(query, embedding, top_k=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    for r in range(rounds):
+        await asyncio.gather(*(request(f"query {r}-{i}") for i in range(clients)))
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Upstream calls and latency with and without micro-batching.")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.clients} concurrent clients x {args.rounds} rounds")
+    for batching in (False, True):
+        raw_embedder = StandInEmbedder()
+        raw_retriever = StandInRetriever(raw_embedder)
+        embedder, retriever = raw_embedder, raw_retriever
+        if batching:
+            embedder = BatchingEmbedder(raw_embedder, args.max_batch_size, args.max_wait_ms)
+            retriever = BatchingRetriever(raw_retriever, args.max_batch_size, args.max_wait_ms)
+
+        p50, p99 = await run_load(embedder, retriever, args.clients, args.rounds)
+        print(
+            f"batching={'on ' if batching else 'off'}  embed_calls={raw_embedder.upstream.calls:>4}  "
+            f"search_calls={raw_retriever.upstream.calls:>4}  p50={p50:7.1f} ms  p99={p99:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Lookup latency of the in-process semantic cache store.
+
+Fills a LocalCacheStore with random unit vectors, then queries it with
+near-duplicates of stored entries (cosine ~0.97, i.e. cache hits) and with
+unrelated vectors (misses). Reports p50/p99 lookup latency and whether each
+near-duplicate found its own entry, for the two-stage scan and for a plain
+full-dimension scan.
+
+    python benchmarks/bench_cache_store.py --entries 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from cache_store import LocalCacheStore
+
+
+def unit(rows, dimension, rng):
+    vectors = rng.standard_normal((rows, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run(store, stored, queries, expected):
+    latencies = []
+    correct = 0
+    for query, slot in zip(queries, expected):
+        start = time.perf_counter()
+        match = store.query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if slot is not None and match["id"] == f"q{slot}":
+            correct += 1
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), correct
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    stored = unit(args.entries, args.dimension, rng)
+
+    hit_slots = rng.integers(0, args.entries, args.queries)
+    noise = unit(args.queries, args.dimension, rng)
+    near_duplicates = stored[hit_slots] + 0.25 * noise
+    misses = unit(args.queries, args.dimension, rng)
+
+    for label, coarse_dims in (("two-stage", 32), ("full scan", args.dimension)):
+        store = LocalCacheStore(dimension=args.dimension, capacity=args.entries, coarse_dims=coarse_dims)
+        start = time.perf_counter()
+        for i, vector in enumerate(stored):
+            store.upsert(f"q{i}", vector, {"answer": str(i)})
+        fill = time.perf_counter() - start
+
+        hit_p50, hit_p99, correct = run(store, stored, near_duplicates, hit_slots)
+        miss_p50, miss_p99, _ = run(store, stored, misses, [None] * args.queries)
+        print(
+            f"{label:>9}: entries={args.entries} fill={fill:.1f}s  "
+            f"hit p50={hit_p50:.3f}ms p99={hit_p99:.3f}ms  "
+            f"miss p50={miss_p50:.3f}ms p99={miss_p99:.3f}ms  "
+            f"recall={correct}/{args.queries}"
+        )
+        del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Peak memory and throughput of the chunker as the corpus grows.
+
+Builds synthetic scrapes of increasing size by repeating the pages in
+json_data/parent.jsonl under new sources, then chunks each one in a fresh
+process two ways: "in-memory" loads a JSON array, builds every child in one
+list and dumps both files as JSON (the chunker before streaming), and
+"streaming" runs chunking.chunk_files() over JSONL. Reports pages/sec and the
+peak RSS of the chunking process and of its largest splitter worker.
+
+    python benchmarks/bench_chunking.py --sizes 1000,4000,16000 --workers 2
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from jsonl import read_jsonl, write_jsonl
+
+
+def synthetic_pages(pages, size):
+    for i in range(size):
+        page = dict(pages[i % len(pages)])
+        page["source"] = f"{page['source']}#{i}"
+        page.pop("parent_id", None)
+        yield page
+
+
+def write_corpus(pages, size, workdir):
+    jsonl_path = os.path.join(workdir, f"scrape_{size}.jsonl")
+    json_path = os.path.join(workdir, f"scrape_{size}.json")
+    write_jsonl(jsonl_path, synthetic_pages(pages, size))
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, page in enumerate(synthetic_pages(pages, size)):
+            f.write(("," if i else "") + json.dumps(page, ensure_ascii=False))
+        f.write("]")
+    return jsonl_path, json_path
+
+
+def run_in_memory(input_path, workdir):
+    # The chunker before streaming: every child in one list
+    from chunking import chunk_parent, make_splitter, parent_id_for
+
+    with open(input_path, "r", encoding="utf-8") as f:
+        parents = json.load(f)
+    text_splitter = make_splitter()
+    children = []
+    for parent in parents:
+        parent["parent_id"] = parent_id_for(parent)
+        children.extend(chunk_parent(parent, text_splitter))
+    with open(os.path.join(workdir, "parent.json"), "w", encoding="utf-8") as f:
+        json.dump(parents, f, indent=2, ensure_ascii=False)
+    with open(os.path.join(workdir, "child.json"), "w", encoding="utf-8") as f:
+        json.dump(children, f, indent=4)
+    return len(parents), len(children)
+
+
+def run_streaming(input_path, workdir, workers):
+    from chunking import chunk_files
+
+    counts = chunk_files(input_path, os.path.join(workdir, "parent.jsonl"),
+                         os.path.join(workdir, "child.jsonl"), workers)
+    return counts["parents"], counts["children"]
+
+
+def measure(args):
+    # Runs in the child process: one chunking pass, then its own peak RSS
+    start = time.perf_counter()
+    if args.run == "in-memory":
+        pages, children = run_in_memory(args.input, args.workdir)
+    else:
+        pages, children = run_streaming(args.input, args.workdir, args.workers)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "pages": pages,
+        "children": children,
+        "seconds": elapsed,
+        # KiB on Linux; workers are reaped by now, so RUSAGE_CHILDREN is the largest of them
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "worker_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }))
+
+
+def run(mode, input_path, workdir, workers):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run", mode, "--input", input_path,
+         "--workdir", workdir, "--workers", str(workers)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS and pages/sec of the chunker as the corpus grows.")
+    parser.add_argument("--parents", default="json_data/parent.jsonl", help="Pages the synthetic scrapes repeat.")
+    parser.add_argument("--sizes", default="1000,4000,16000", help="Comma-separated corpus sizes in pages.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--run", choices=["in-memory", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        measure(args)
+        return
+
+    pages = list(read_jsonl(args.parents))
+    print(f"{'pages':>7} {'mode':<10} {'children':>9} {'pages/sec':>10} {'peak RSS':>10} {'worker RSS':>11}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            jsonl_path, json_path = write_corpus(pages, size, workdir)
+            for mode, input_path in (("in-memory", json_path), ("streaming", jsonl_path)):
+                result = run(mode, input_path, workdir, args.workers)
+                rate = result["pages"] / result["seconds"] if result["seconds"] > 0 else 0.0
+                worker_rss = f"{result['worker_rss_mb']:8.1f} MB" if mode == "streaming" and args.workers > 1 else "-"
+                print(f"{size:>7} {mode:<10} {result['children']:>9} {rate:>10.1f} "
+                      f"{result['rss_mb']:>7.1f} MB {worker_rss:>11}")
+            os.remove(jsonl_path)
+            os.remove(json_path)
+
+
+if __name__ == "__main__":
+    main()
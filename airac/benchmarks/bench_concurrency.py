@@ -0,0 +1,131 @@
+"""
+Concurrency check for the async /query path.
+
+Runs Badal.ainvoke against local stand-ins that simulate the network waits of
+Jina, Pinecone and Groq with asyncio.sleep, then reports how throughput scales
+as the number of concurrent clients grows. With a non-blocking pipeline the
+throughput should grow roughly linearly with concurrency.
+
+    python benchmarks/bench_concurrency.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from retrieval_pipeline import Badal
+
+EMBED_LATENCY = 0.03
+VECTOR_LATENCY = 0.02
+LLM_LATENCY = 0.2
+
+
+class StandInKey:
+    api_key = "stand-in"
+    label = "stand-in"
+
+    def __init__(self):
+        def generate(prompt):
+            time.sleep(LLM_LATENCY)
+            return AIMessage(content="stand-in answer")
+
+        async def agenerate(prompt):
+            await asyncio.sleep(LLM_LATENCY)
+            return AIMessage(content="stand-in answer")
+
+        self.model = RunnableLambda(generate, afunc=agenerate)
+
+
+class StandInKeyManager:
+    def __init__(self):
+        self.key = StandInKey()
+
+    def acquire(self, tokens=0):
+        return self.key
+
+    async def aacquire(self, tokens=0):
+        return self.key
+
+    def backoff(self, attempt):
+        return 0.0
+
+    def stats(self):
+        return []
+
+
+class StandInEmbedder:
+    async def aembed(self, text):
+        await asyncio.sleep(EMBED_LATENCY)
+        return [0.0] * 1024
+
+    async def aclose(self):
+        pass
+
+
+class StandInCache:
+    async def aget(self, query, query_embedding=None):
+        await asyncio.sleep(VECTOR_LATENCY)
+        return None
+
+    async def aadd(self, query, parent_ids, query_embedding=None, answer=None):
+        await asyncio.sleep(VECTOR_LATENCY)
+
+    async def aclose(self):
+        pass
+
+
+STAND_IN_RESULT = {"matches": [
+    {"id": "child", "score": 0.9, "metadata": {"parent_id": "stand-in", "original_data": "\"Breakfast\""}}
+]}
+
+
+class StandInParentStore:
+    def get(self, parent_id):
+        return {"parent_id": parent_id, "title": "Mess timings", "text": "Breakfast is served from 7:30 to 9:30.", "tables": []}
+
+
+class StandInRetriever:
+    async def aget(self, query, query_embedding=None):
+        await asyncio.sleep(VECTOR_LATENCY)
+        return STAND_IN_RESULT
+
+    async def aclose(self):
+        pass
+
+
+async def run_clients(badal, clients, queries_per_client):
+    async def client(i):
+        for j in range(queries_per_client):
+            await badal.ainvoke(f"query {i}-{j}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    return clients * queries_per_client / elapsed
+
+
+async def main():
+    badal = Badal(
+        key_manager=StandInKeyManager(),
+        embedder=StandInEmbedder(),
+        cache=StandInCache(),
+        retriever=StandInRetriever(),
+        parent_store=StandInParentStore(),
+    )
+
+    baseline = None
+    for clients in (1, 4, 16, 64):
+        qps = await run_clients(badal, clients, queries_per_client=4)
+        baseline = baseline or qps
+        print(f"clients={clients:>3}  throughput={qps:8.1f} q/s  speedup={qps / baseline:5.1f}x")
+
+    # A blocking pipeline would stay near 1x regardless of concurrency
+    assert qps / baseline > 16, "throughput did not scale with concurrent clients"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
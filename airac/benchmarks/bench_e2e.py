@@ -0,0 +1,304 @@
+"""
+Offline end-to-end benchmark of Badal and the FastAPI app.
+
+Only the network is simulated. Jina and Groq are served by httpx mock
+transports behind the real JinaEmbeddings and GroqKeyManager/ChatGroq
+clients:
+- The Jina stand-in returns deterministic hashed bag-of-words vectors, so
+  paraphrases land close together.
+- The Groq stand-in has configurable latency and injects 429s at a
+  configurable rate.
+Everything else is the production code: the local NumPy index (built
+from json_data with the same stand-in vectors), hybrid BM25 retrieval,
+the parent store, the in-process semantic cache and the answer cache.
+
+The benchmark drives a query mix of repeats, paraphrases and fresh
+questions at the chosen concurrency. It reports throughput, cache tiers
+and p50/p95/p99 per stage and end to end. Stages are the pipeline's own
+timing spans (graph nodes and outbound calls), read directly for the
+badal target and from the Server-Timing header for the app target.
+
+    python benchmarks/bench_e2e.py --requests 400 --concurrency 16
+    python benchmarks/bench_e2e.py --target app --output results.json
+    python benchmarks/bench_e2e.py --baseline results.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+import numpy as np
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, os.path.join(BACKEND, ".."))
+sys.path.insert(0, BACKEND)
+
+from groq_keys import GroqKeyManager
+from metrics import request_timings
+
+DIMENSION = 1024
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compaction_samples.jsonl")
+
+
+# -------------------------------
+# Service stand-ins
+# -------------------------------
+def hashed_embedding(text):
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        vector[int.from_bytes(digest[:4], "little") % DIMENSION] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class StandInJina:
+    def __init__(self, latency, per_item):
+        self.latency = latency
+        self.per_item = per_item
+        self.calls = 0
+
+    async def handle(self, request):
+        self.calls += 1
+        texts = json.loads(request.content)["input"]
+        texts = texts if isinstance(texts, list) else [texts]
+        await asyncio.sleep(self.latency + self.per_item * len(texts))
+        return httpx.Response(200, json={"data": [
+            {"index": i, "embedding": hashed_embedding(text)} for i, text in enumerate(texts)
+        ]})
+
+
+class StandInGroq:
+    def __init__(self, latency, error_rate, seed):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.rate_limited = 0
+
+    async def handle(self, request):
+        self.calls += 1
+        headers = {"x-ratelimit-remaining-tokens": "100000", "x-ratelimit-limit-tokens": "100000"}
+        if self.random.random() < self.error_rate:
+            self.rate_limited += 1
+            headers["retry-after"] = "1"
+            return httpx.Response(429, headers=headers, json={"error": {"message": "Rate limit reached"}})
+
+        await asyncio.sleep(self.latency)
+        body = json.loads(request.content)
+        return httpx.Response(200, headers=headers, json={
+            "id": "chatcmpl-stand-in", "object": "chat.completion", "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "stand-in answer"},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3},
+        })
+
+
+def build_local_index(children_path, workdir):
+    # Stand-in vectors for every child, in the layout local_index.build() writes
+    from jsonl import read_jsonl
+    from local_index import ids_path_for
+
+    children = list(read_jsonl(children_path))
+    embeddings_path = os.path.join(workdir, "child_embeddings.npy")
+    np.save(embeddings_path, np.asarray([hashed_embedding(c["text"]) for c in children], dtype=np.float32))
+    with open(ids_path_for(embeddings_path), "w", encoding="utf-8") as f:
+        json.dump([c["child_id"] for c in children], f)
+    return embeddings_path
+
+
+def build_pipeline(args, workdir):
+    os.environ.update({
+        "RETRIEVAL_BACKEND": "local",
+        "CACHE_BACKEND": "local",
+        "LOCAL_INDEX_CHILDREN": args.children,
+        "LOCAL_INDEX_EMBEDDINGS": build_local_index(args.children, workdir),
+        "CACHE_SNAPSHOT_PATH": os.path.join(workdir, "semantic_cache.npz"),
+        "PARENT_STORE_PATH": os.path.join(workdir, "parents.db"),
+        "JINA_API_KEY": "stand-in",
+        "GROQ_KEYS": ",".join(f"gsk_stand_in_{i}" for i in range(args.groq_keys)),
+        "GROQ_RPM": "100000",
+        "GROQ_TPM": "100000000",
+        "GROQ_BACKOFF_BASE": "0.05",
+    })
+
+    from retrieval_pipeline import Badal
+    from embeddings import JinaEmbeddings
+
+    jina = StandInJina(args.embed_latency, args.embed_per_item)
+    groq = StandInGroq(args.llm_latency, args.error_rate, args.seed)
+    badal = Badal(key_manager=GroqKeyManager(transport=httpx.MockTransport(groq.handle)))
+
+    # Route every Jina client in the pipeline to the stand-in
+    for component in (badal.embedder, getattr(badal.embedder, "embedder", None)):
+        if isinstance(component, JinaEmbeddings):
+            component.http_client = httpx.AsyncClient(transport=httpx.MockTransport(jina.handle))
+    return badal, jina, groq
+
+
+# -------------------------------
+# Query mix
+# -------------------------------
+PARAPHRASES = ["{q}", "{q_lower}", "please tell me {q_lower}", "{q} thanks", "hey, {q_lower}"]
+
+
+def query_mix(samples, requests, repeat_ratio, seed):
+    # Zipf-like popularity over the sample questions; a share of requests are
+    # exact repeats, the rest paraphrases of a popular question
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(samples))]
+    queries = []
+    for _ in range(requests):
+        q = rng.choices(samples, weights)[0]["query"]
+        if rng.random() >= repeat_ratio:
+            q = rng.choice(PARAPHRASES).format(q=q, q_lower=q.lower())
+        queries.append(q)
+    return queries
+
+
+# -------------------------------
+# Drivers
+# -------------------------------
+async def run_badal(badal, query, stages):
+    # Requests that join an identical in-flight query record only their total
+    timings = []
+    request_timings.set(timings)
+    start = time.perf_counter()
+    result = await badal.arun(query)
+    for stage, elapsed in timings:
+        stages[stage].append(elapsed * 1000)
+    stages["total"].append((time.perf_counter() - start) * 1000)
+    return result["cache_tier"]
+
+
+async def run_app(client, query, stages):
+    start = time.perf_counter()
+    response = await client.post("/query", json={"query": query})
+    stages["total"].append((time.perf_counter() - start) * 1000)
+    for entry in response.headers.get("server-timing", "").split(","):
+        stage, _, duration = entry.strip().partition(";dur=")
+        if duration and stage != "total":
+            stages[stage].append(float(duration))
+    return response.json().get("cache_tier") or "error"
+
+
+async def drive(queries, concurrency, call):
+    stages = defaultdict(list)
+    tiers = Counter()
+    pending = iter(queries)
+
+    async def worker():
+        # Each worker is its own task, so its request_timings stay separate
+        for query in pending:
+            try:
+                tiers[await call(query, stages)] += 1
+            except Exception:
+                tiers["error"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stages, tiers, time.perf_counter() - start
+
+
+def summarize(stages):
+    return {
+        stage: {
+            "count": len(values),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+        }
+        for stage, values in stages.items()
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(result, baseline):
+    print(f"\nvs baseline {baseline.get('commit')}:")
+    change = result["throughput_qps"] / baseline["throughput_qps"] - 1
+    print(f"  throughput {baseline['throughput_qps']:8.1f} -> {result['throughput_qps']:8.1f} q/s  ({change:+.0%})")
+    for stage, stats in result["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before:
+            change = stats["p99_ms"] / before["p99_ms"] - 1 if before["p99_ms"] else 0.0
+            print(f"  {stage:<14} p99 {before['p99_ms']:8.1f} -> {stats['p99_ms']:8.1f} ms  ({change:+.0%})")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with local service stand-ins.")
+    parser.add_argument("--target", choices=["badal", "app"], default="badal")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat-ratio", type=float, default=0.3)
+    parser.add_argument("--embed-latency", type=float, default=0.03)
+    parser.add_argument("--embed-per-item", type=float, default=0.0005)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of LLM calls answered with a 429.")
+    parser.add_argument("--groq-keys", type=int, default=4)
+    parser.add_argument("--samples", default=SAMPLES_PATH)
+    parser.add_argument("--children", default="json_data/child.jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--baseline", help="Compare against a previous --output file.")
+    args = parser.parse_args()
+
+    with open(args.samples, "r", encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    queries = query_mix(samples, args.requests, args.repeat_ratio, args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        badal, jina, groq = build_pipeline(args, workdir)
+        if args.target == "badal":
+            stages, tiers, elapsed = await drive(queries, args.concurrency, lambda q, s: run_badal(badal, q, s))
+        else:
+            import backend.app as app_module
+
+            app_module.badal_pipeline = badal
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                stages, tiers, elapsed = await drive(queries, args.concurrency, lambda q, s: run_app(client, q, s))
+        await badal.aclose()
+
+    result = {
+        "commit": git_commit(),
+        "config": vars(args),
+        "throughput_qps": round(len(queries) / elapsed, 2),
+        "cache_tiers": dict(tiers),
+        "upstream_calls": {"jina": jina.calls, "groq": groq.calls, "groq_429": groq.rate_limited},
+        "stages": summarize(stages),
+    }
+
+    print(f"{args.target}: {len(queries)} requests at concurrency {args.concurrency} "
+          f"-> {result['throughput_qps']:.1f} q/s")
+    print(f"cache tiers: {result['cache_tiers']}")
+    print(f"upstream calls: {result['upstream_calls']}")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<14} n={stats['count']:>4}  p50={stats['p50_ms']:8.1f}  "
+              f"p95={stats['p95_ms']:8.1f}  p99={stats['p99_ms']:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
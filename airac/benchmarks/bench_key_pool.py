@@ -0,0 +1,162 @@
+"""
+Sustained-load check for the Groq key pool.
+
+Runs Badal's answer step through real ChatGroq clients against a simulated
+Groq endpoint (an httpx mock transport) that enforces a per-key requests and
+tokens-per-minute budget and answers with the same x-ratelimit-* headers and
+429s as the real API. Compares the budget-aware pool with plain round-robin
+key rotation that only reacts to 429s, and reports 429 count, completed
+answers and throughput for each.
+
+    python benchmarks/bench_key_pool.py --keys 3 --clients 32 --seconds 10
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from bench_concurrency import StandInCache, StandInEmbedder, StandInParentStore, StandInRetriever
+from groq_keys import GroqKeyManager, estimate_tokens
+from retrieval_pipeline import Badal
+
+LLM_LATENCY = 0.05
+COMPLETION_TOKENS = 64
+
+
+class SimulatedGroq:
+    """Per-key token buckets, refilled continuously like Groq's per-minute limits."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.buckets = {}
+        self.ok = 0
+        self.rate_limited = 0
+
+    def _bucket(self, key, now):
+        requests, tokens, updated = self.buckets.get(key, (self.rpm, self.tpm, now))
+        requests = min(self.rpm, requests + (now - updated) * self.rpm / 60)
+        tokens = min(self.tpm, tokens + (now - updated) * self.tpm / 60)
+        return requests, tokens
+
+    async def handle(self, request):
+        key = request.headers["authorization"].split()[-1]
+        body = json.loads(request.content)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in body["messages"])
+        used = prompt_tokens + COMPLETION_TOKENS
+
+        now = time.monotonic()
+        requests, tokens = self._bucket(key, now)
+        limited = requests < 1 or tokens < used
+        if not limited:
+            requests -= 1
+            tokens -= used
+        self.buckets[key] = (requests, tokens, now)
+
+        headers = {
+            "x-ratelimit-limit-requests": "14400",
+            "x-ratelimit-remaining-requests": "14000",
+            "x-ratelimit-limit-tokens": str(self.tpm),
+            "x-ratelimit-remaining-tokens": str(int(tokens)),
+            "x-ratelimit-reset-tokens": f"{(self.tpm - tokens) * 60 / self.tpm:.2f}s",
+        }
+        if limited:
+            self.rate_limited += 1
+            wait = max((1 - requests) * 60 / self.rpm, (used - tokens) * 60 / self.tpm, 0)
+            headers["retry-after"] = str(max(1, round(wait)))
+            error = {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}}
+            return httpx.Response(429, headers=headers, json=error)
+
+        await asyncio.sleep(LLM_LATENCY)
+        self.ok += 1
+        return httpx.Response(200, headers=headers, json={
+            "id": "chatcmpl-sim", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "stand-in answer"},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": COMPLETION_TOKENS,
+                      "total_tokens": used},
+        })
+
+
+class RoundRobinKeys(GroqKeyManager):
+    # The previous behaviour: next key in turn, no budget, rotate after a 429
+    def __init__(self, transport):
+        super().__init__(transport=transport)
+        self.turn = itertools.cycle(self.keys)
+
+    async def aacquire(self, tokens=0):
+        key = next(self.turn)
+        if key.model is None:
+            key.model = self._client_for(key)
+        return key
+
+
+STATE = {
+    "query": "What are the mess timings?",
+    "retrieved_text": "Breakfast is served from 7:30 to 9:30. " * 20,
+    "retrieved_tables": [],
+}
+
+
+async def run_load(badal, clients, seconds):
+    completed = 0
+    failed = 0
+    deadline = time.monotonic() + seconds
+
+    async def client():
+        nonlocal completed, failed
+        while time.monotonic() < deadline:
+            try:
+                await badal.aget_answer(STATE)
+                completed += 1
+            except Exception:
+                failed += 1
+
+    start = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return completed, failed, time.monotonic() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="429s under sustained load with and without key budgets.")
+    parser.add_argument("--keys", type=int, default=3)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--tpm", type=int, default=60000)
+    args = parser.parse_args()
+
+    os.environ["GROQ_KEYS"] = ",".join(f"gsk_sim_key_{i}" for i in range(args.keys))
+    os.environ["GROQ_RPM"] = str(args.rpm)
+    os.environ["GROQ_TPM"] = str(args.tpm)
+    os.environ["GROQ_COMPLETION_TOKENS"] = str(COMPLETION_TOKENS)
+
+    print(f"{args.keys} keys x {args.rpm} RPM / {args.tpm} TPM, {args.clients} clients for {args.seconds:.0f} s")
+    for name in ("round-robin", "budgeted"):
+        server = SimulatedGroq(args.rpm, args.tpm)
+        transport = httpx.MockTransport(server.handle)
+        keys = RoundRobinKeys(transport) if name == "round-robin" else GroqKeyManager(transport=transport)
+        badal = Badal(
+            key_manager=keys,
+            embedder=StandInEmbedder(),
+            cache=StandInCache(),
+            retriever=StandInRetriever(),
+            parent_store=StandInParentStore(),
+        )
+
+        completed, failed, elapsed = await run_load(badal, args.clients, args.seconds)
+        print(
+            f"{name:<12} answers={completed:>5}  failed={failed:>4}  429s={server.rate_limited:>5}  "
+            f"throughput={completed / elapsed:6.1f} answers/s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
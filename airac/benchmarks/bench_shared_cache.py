@@ -0,0 +1,155 @@
+"""
+Per-process vs host-wide shared caching across several workers.
+
+Starts --workers processes, as uvicorn --workers would, each with its own
+Badal over the offline stand-ins of bench_e2e (mock Jina and Groq, the local
+index, the in-process semantic cache). The query mix is dealt round-robin to
+the workers, like a load balancer would, and replayed twice: once with
+SHARED_CACHE_BACKEND=off (every worker caches for itself) and once with the
+SQLite shared cache. Reports requests answered without the LLM and the
+upstream calls: Jina requests, index searches and Groq completions.
+
+    python benchmarks/bench_shared_cache.py --workers 4 --requests 800
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from bench_e2e import SAMPLES_PATH, build_pipeline, query_mix
+
+LLM_FREE_TIERS = ("exact_answer", "semantic_answer", "table_answer")
+
+
+async def serve(args, workdir, queries, barrier):
+    badal, jina, groq = build_pipeline(args, workdir)
+
+    # Queries that reach the local index, past every cache
+    from local_index import RetrieveLocal
+    searches = Counter()
+    search, search_batch = RetrieveLocal.search, RetrieveLocal.search_batch
+
+    def counted_search(self, query_embedding, top_k=1):
+        searches["index"] += 1
+        return search(self, query_embedding, top_k)
+
+    def counted_search_batch(self, query_embeddings, top_k=1):
+        searches["index"] += len(query_embeddings)
+        return search_batch(self, query_embeddings, top_k)
+    RetrieveLocal.search, RetrieveLocal.search_batch = counted_search, counted_search_batch
+
+    tiers = Counter()
+    pending = iter(queries)
+
+    async def client():
+        for query in pending:
+            try:
+                tiers[(await badal.arun(query))["cache_tier"]] += 1
+            except Exception:
+                tiers["error"] += 1
+
+    # Every worker starts once all of them are up
+    await asyncio.to_thread(barrier.wait)
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    stats = badal.stats()["shared_cache"]
+    await badal.aclose()
+    return {
+        "tiers": dict(tiers),
+        "jina": jina.calls,
+        "groq": groq.calls,
+        "index": searches["index"],
+        "elapsed": elapsed,
+        "shared": stats,
+    }
+
+
+def worker(index, mode, args, queries, barrier, results):
+    # Per mode too: the semantic cache snapshot a worker saves on close
+    # must not warm the next mode's run
+    workdir = os.path.join(args.workdir, mode, f"worker{index}")
+    os.makedirs(workdir, exist_ok=True)
+    results.put(asyncio.run(serve(args, workdir, queries, barrier)))
+
+
+def run(mode, args, queries):
+    os.environ["SHARED_CACHE_BACKEND"] = mode
+    os.environ["SHARED_CACHE_PATH"] = os.path.join(args.workdir, f"shared_{mode}.db")
+    # Spawned like uvicorn workers: a fresh interpreter each
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(i, mode, args, queries[i::args.workers], barrier, results))
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    total = {"tiers": Counter(), "jina": 0, "groq": 0, "index": 0, "hits": 0, "misses": 0}
+    for result in collected:
+        total["tiers"].update(result["tiers"])
+        for key in ("jina", "groq", "index"):
+            total[key] += result[key]
+        if result["shared"]:
+            total["hits"] += result["shared"]["hits"]
+            total["misses"] += result["shared"]["misses"]
+    total["elapsed"] = max(result["elapsed"] for result in collected)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache hit rate and upstream calls, per-process vs shared cache.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=800)
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients per worker.")
+    parser.add_argument("--repeat-ratio", type=float, default=0.5)
+    parser.add_argument("--embed-latency", type=float, default=0.03)
+    parser.add_argument("--embed-per-item", type=float, default=0.0005)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--groq-keys", type=int, default=4)
+    parser.add_argument("--samples", default=SAMPLES_PATH)
+    parser.add_argument("--children", default=os.path.abspath("json_data/child.jsonl"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.samples, "r", encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    queries = query_mix(samples, args.requests, args.repeat_ratio, args.seed)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        for mode in ("off", "sqlite"):
+            results[mode] = run(mode, args, queries)
+
+    print(f"{args.requests} requests over {args.workers} workers")
+    for mode, name in (("off", "per-process"), ("sqlite", "shared")):
+        total = results[mode]
+        llm_free = sum(total["tiers"].get(tier, 0) for tier in LLM_FREE_TIERS)
+        lookups = total["hits"] + total["misses"]
+        shared = f"  shared hit rate={total['hits'] / lookups:.0%}" if lookups else ""
+        print(f"  {name:<12} answered without LLM={llm_free / args.requests:6.1%}  jina={total['jina']:>4}  "
+              f"index={total['index']:>4}  groq={total['groq']:>4}  {total['elapsed']:5.1f}s{shared}")
+        print(f"  {'':<12} tiers: {dict(total['tiers'])}")
+
+    before, after = results["off"], results["sqlite"]
+    for key, name in (("jina", "Jina requests"), ("index", "index searches"), ("groq", "Groq completions")):
+        change = after[key] / before[key] - 1 if before[key] else 0.0
+        print(f"{name:<16} {before[key]:>5} -> {after[key]:>5}  ({change:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
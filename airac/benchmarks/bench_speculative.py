@@ -0,0 +1,128 @@
+"""
+Sequential vs speculative retrieval.
+
+Runs the same query mix through Badal with RETRIEVAL_MODE=sequential and
+RETRIEVAL_MODE=speculative, against stand-ins that simulate the network waits
+of Jina, the semantic cache, the vector index and Groq with asyncio.sleep. A
+share of the queries hit the semantic cache with a stored answer; the rest
+miss and go to the index and the LLM. The index sits behind the
+BatchingRetriever, as in build_retriever(). Reports p50/p99 latency of both
+paths and how many index searches ran to completion.
+
+    python benchmarks/bench_speculative.py --cache-latency 0.03 --index-latency 0.04
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import bench_concurrency
+from bench_concurrency import STAND_IN_RESULT, StandInEmbedder, StandInKeyManager, StandInParentStore
+from batching import BatchingRetriever
+from langchain_core.documents import Document
+from retrieval_pipeline import Badal
+
+
+class StandInCache:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def aget(self, query, query_embedding=None):
+        await asyncio.sleep(self.latency)
+        if not query.startswith("hit"):
+            return None
+        metadata = {"parent_ids": ["stand-in"], "answer": "cached answer", "score": 0.99}
+        return [Document(page_content=query, metadata=metadata)]
+
+    async def aadd(self, query, parent_ids, query_embedding=None, answer=None):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+class StandInRetriever:
+    def __init__(self, latency, per_item):
+        self.embedder = None
+        self.latency = latency
+        self.per_item = per_item
+        self.started = 0
+        self.completed = 0
+
+    async def asearch_batch(self, query_embeddings, top_k=1):
+        # Searches sent upstream, whether or not their caller still waits
+        self.started += len(query_embeddings)
+        await asyncio.sleep(self.latency + self.per_item * len(query_embeddings))
+        self.completed += len(query_embeddings)
+        return [STAND_IN_RESULT] * len(query_embeddings)
+
+    async def aclose(self):
+        pass
+
+
+async def run_mode(mode, queries, args):
+    os.environ["RETRIEVAL_MODE"] = mode
+    retriever = StandInRetriever(args.index_latency, args.index_per_item)
+    badal = Badal(
+        key_manager=StandInKeyManager(),
+        embedder=StandInEmbedder(),
+        cache=StandInCache(args.cache_latency),
+        retriever=BatchingRetriever(retriever, args.batch_max_size, args.batch_max_wait_ms),
+        parent_store=StandInParentStore(),
+    )
+
+    latencies = {"semantic_answer": [], "retrieval": []}
+    pending = iter(queries)
+
+    async def worker():
+        for query in pending:
+            start = time.perf_counter()
+            result = await badal.arun(query)
+            latencies[result["cache_tier"]].append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    await badal.aclose()
+    return latencies, retriever
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Miss- and hit-path latency of sequential vs speculative retrieval.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--hit-ratio", type=float, default=0.3, help="Share of queries the semantic cache answers.")
+    parser.add_argument("--cache-latency", type=float, default=0.03)
+    parser.add_argument("--index-latency", type=float, default=0.04)
+    parser.add_argument("--index-per-item", type=float, default=0.001, help="Added index latency per query in a batch.")
+    parser.add_argument("--batch-max-size", type=int, default=32)
+    parser.add_argument("--batch-max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bench_concurrency.LLM_LATENCY = args.llm_latency
+    rng = random.Random(args.seed)
+    queries = [f"{'hit' if rng.random() < args.hit_ratio else 'miss'} query {i}" for i in range(args.requests)]
+
+    results = {}
+    for mode in ("sequential", "speculative"):
+        latencies, retriever = await run_mode(mode, queries, args)
+        results[mode] = latencies
+        print(f"{mode}: index searches started={retriever.started} completed={retriever.completed}")
+        for tier, name in (("retrieval", "miss"), ("semantic_answer", "hit")):
+            values = latencies[tier]
+            print(f"  {name:<5} n={len(values):>4}  p50={np.percentile(values, 50):8.1f}  "
+                  f"p99={np.percentile(values, 99):8.1f} ms")
+
+    saved = np.percentile(results["sequential"]["retrieval"], 50) - np.percentile(results["speculative"]["retrieval"], 50)
+    print(f"\nmiss-path p50 saved by speculation: {saved:.1f} ms "
+          f"(cache lookup is {args.cache_latency * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
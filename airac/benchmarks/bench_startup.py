@@ -0,0 +1,105 @@
+"""
+Cold-start timing of the API server.
+
+Starts uvicorn on backend.app:app in a fresh process, with the local retrieval
+and cache backends over stand-in vectors (no network), and polls it. Reports
+the time from process start until the first request is served (/health) and
+until the pipeline can answer queries (/ready, or /health reporting the
+pipeline operational on trees without /ready). --root points at another
+checkout, e.g. a git worktree of an older commit, to compare the two.
+
+    python benchmarks/bench_startup.py --runs 3
+    git worktree add /tmp/airac-before <commit>
+    python benchmarks/bench_startup.py --root /tmp/airac-before/airac
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from bench_e2e import build_local_index
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def is_ready(client):
+    response = client.get("/ready")
+    if response.status_code != 404:
+        return response.status_code == 200
+    return client.get("/health").json().get("rag_pipeline") == "operational"
+
+
+def cold_start(root, workdir, embeddings_path, timeout):
+    port = free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.path.join(root, "backend"),
+        "RETRIEVAL_BACKEND": "local",
+        "CACHE_BACKEND": "local",
+        "LOCAL_INDEX_EMBEDDINGS": embeddings_path,
+        "CACHE_SNAPSHOT_PATH": os.path.join(workdir, "semantic_cache.npz"),
+        "PARENT_STORE_PATH": os.path.join(root, "json_data", "parents.db"),
+        "JINA_API_KEY": "stand-in",
+        "GROQ_KEYS": "gsk_stand_in",
+    }
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    first_response = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while ready is None and time.perf_counter() - start < timeout:
+                try:
+                    if first_response is None:
+                        client.get("/health")
+                        first_response = time.perf_counter() - start
+                    if is_ready(client):
+                        ready = time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_response, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time from server start to first response and to readiness.")
+    parser.add_argument("--root", default=ROOT, help="Checkout to start the server from (the airac directory).")
+    parser.add_argument("--children", default=os.path.join(ROOT, "json_data", "child.jsonl"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        embeddings_path = build_local_index(args.children, workdir)
+        results = [cold_start(os.path.abspath(args.root), workdir, embeddings_path, args.timeout)
+                   for _ in range(args.runs)]
+
+    if any(ready is None for _, ready in results):
+        sys.exit(f"server did not become ready within {args.timeout:.0f}s")
+    for i, (first_response, ready) in enumerate(results):
+        print(f"run {i + 1}: first response {first_response:6.2f}s  ready {ready:6.2f}s")
+    print(f"median: first response {np.median([r[0] for r in results]):.2f}s  "
+          f"ready {np.median([r[1] for r in results]):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Traffic share, latency and accuracy of the table fast path.
+
+Replays the same query mix through Badal over the offline stand-ins of
+bench_e2e, with TABLE_FAST_PATH=false and =true. Reports the share of
+requests each tier served, p50/p99 latency per tier and of the lookup_table
+node itself, the Groq calls made, and how many fast-path answers contain the
+expected value from the samples file.
+
+    python benchmarks/bench_table_fast_path.py --requests 400 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from bench_e2e import SAMPLES_PATH, build_pipeline, query_mix
+from embeddings import normalize_query
+from metrics import request_timings
+
+
+async def run_mode(enabled, args, queries, expected):
+    os.environ["TABLE_FAST_PATH"] = "true" if enabled else "false"
+    with tempfile.TemporaryDirectory() as workdir:
+        badal, jina, groq = build_pipeline(args, workdir)
+        latencies = defaultdict(list)
+        lookups = []
+        correct = 0
+        pending = iter(queries)
+
+        async def client():
+            nonlocal correct
+            for query in pending:
+                timings = []
+                request_timings.set(timings)
+                start = time.perf_counter()
+                result = await badal.arun(query)
+                lookups.extend(elapsed * 1000 for stage, elapsed in timings if stage == "lookup_table")
+                latencies[result["cache_tier"]].append((time.perf_counter() - start) * 1000)
+                if result["cache_tier"] == "table_answer":
+                    correct += any(value in result["answer"] for value in expected[query])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        await badal.aclose()
+    return latencies, lookups, correct, groq.calls, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Share of traffic and latency served by the table fast path.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat-ratio", type=float, default=0.3)
+    parser.add_argument("--embed-latency", type=float, default=0.03)
+    parser.add_argument("--embed-per-item", type=float, default=0.0005)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--groq-keys", type=int, default=4)
+    parser.add_argument("--samples", default=SAMPLES_PATH)
+    parser.add_argument("--children", default="json_data/child.jsonl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.samples, "r", encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    queries = query_mix(samples, args.requests, args.repeat_ratio, args.seed)
+    # Paraphrases are checked against the sample they were made from
+    by_sample = {normalize_query(sample["query"]): sample["expected"] for sample in samples}
+    expected = {q: next(v for k, v in by_sample.items() if k in normalize_query(q)) for q in set(queries)}
+
+    for enabled in (False, True):
+        latencies, lookups, correct, groq_calls, elapsed = await run_mode(enabled, args, queries, expected)
+        everything = [ms for values in latencies.values() for ms in values]
+        print(f"TABLE_FAST_PATH={str(enabled).lower()}: {len(queries) / elapsed:.1f} q/s  groq calls={groq_calls}  "
+              f"p50={np.percentile(everything, 50):.1f}  p99={np.percentile(everything, 99):.1f} ms")
+        for tier, values in sorted(latencies.items(), key=lambda item: -len(item[1])):
+            print(f"  {tier:<16} share={len(values) / len(queries):6.1%}  "
+                  f"p50={np.percentile(values, 50):8.2f}  p99={np.percentile(values, 99):8.2f} ms")
+        served = len(latencies.get("table_answer", []))
+        if lookups:
+            print(f"  lookup_table node: n={len(lookups)}  p50={np.percentile(lookups, 50):.3f}  "
+                  f"p99={np.percentile(lookups, 99):.3f} ms")
+        if served:
+            print(f"  fast-path answers containing the expected value: {correct}/{served}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Offline evaluation of query-focused context compaction.
+
+For each sample in a JSONL file (one {"query", "expected"} object per line,
+like requests.jsonl), retrieves from the real corpus in json_data with the
+in-process BM25 index, assembles the context with and without compaction and
+checks whether every expected fact survives in the prompt context. Reports
+prompt tokens and fact recall for both.
+
+With --llm, also answers each sample from both contexts with Groq (GROQ_KEYS
+must be set) and checks the expected facts in the answers.
+
+    python benchmarks/eval_compaction.py --budget 1000
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from bench_concurrency import StandInCache, StandInEmbedder, StandInKeyManager
+from hybrid import BM25Index
+from jsonl import read_jsonl
+from retrieval_pipeline import Badal
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "compaction_samples.jsonl")
+
+
+class CorpusParentStore:
+    def __init__(self, parents_path):
+        self.parents = {p["parent_id"]: p for p in read_jsonl(parents_path)}
+
+    def get(self, parent_id):
+        return self.parents.get(parent_id)
+
+
+class BM25Retriever:
+    def __init__(self, children_path, top_k):
+        self.bm25 = BM25Index(read_jsonl(children_path))
+        self.top_k = top_k
+
+    def get(self, query, query_embedding=None):
+        return self.bm25.search(query, self.top_k)
+
+    async def aclose(self):
+        pass
+
+
+def context_text(state):
+    return state["retrieved_text"] + json.dumps(state["retrieved_tables"], ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens and fact recall with and without compaction.")
+    parser.add_argument("--samples", default=SAMPLES_PATH)
+    parser.add_argument("--parents", default="json_data/parent.jsonl")
+    parser.add_argument("--children", default="json_data/child.jsonl")
+    parser.add_argument("--budget", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--llm", action="store_true", help="Also answer with Groq and check the answers.")
+    args = parser.parse_args()
+
+    with open(args.samples, "r", encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+
+    os.environ["CONTEXT_TOKEN_BUDGET"] = str(args.budget)
+    badal = Badal(
+        key_manager=None if args.llm else StandInKeyManager(),
+        embedder=StandInEmbedder(),
+        cache=StandInCache(),
+        retriever=BM25Retriever(args.children, args.top_k),
+        parent_store=CorpusParentStore(args.parents),
+    )
+
+    totals = {"full": [0, 0, 0], "compact": [0, 0, 0]}  # tokens, facts in context, facts in answer
+    for sample in samples:
+        query = sample["query"]
+        result = badal.retriever.get(query)
+        row = []
+        for name, compaction in (("full", False), ("compact", True)):
+            badal.compaction = compaction
+            state = {"query": query, **badal._parse_retrieval(query, result)}
+            found = all(fact in context_text(state) for fact in sample["expected"])
+            totals[name][0] += state["prompt_tokens"]
+            totals[name][1] += found
+            row.append(f"{state['prompt_tokens']:>5} tok {'✓' if found else '✗'}")
+
+            if args.llm:
+                answer = badal.get_answer(state)["answer"]
+                correct = all(fact.lower() in answer.lower() for fact in sample["expected"])
+                totals[name][2] += correct
+                row[-1] += f" answer {'✓' if correct else '✗'}"
+        print(f"{query[:55]:<55}  full: {row[0]}  compact: {row[1]}")
+
+    n = len(samples)
+    print()
+    for name, (tokens, in_context, in_answer) in totals.items():
+        line = f"{name:<8} mean prompt tokens={tokens / n:7.1f}  facts in context={in_context}/{n}"
+        if args.llm:
+            line += f"  correct answers={in_answer}/{n}"
+        print(line)
+    print(f"prompt size reduced by {1 - totals['compact'][0] / totals['full'][0]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
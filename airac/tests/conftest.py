@@ -0,0 +1,104 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Modules in backend/ import each other by their flat names, as under uvicorn
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+# Simulated network waits of Jina, the vector indexes and Groq
+EMBED_LATENCY = 0.02
+VECTOR_LATENCY = 0.02
+LLM_LATENCY = 0.1
+
+
+class StandInKey:
+    api_key = "stand-in"
+    label = "stand-in"
+
+    def __init__(self):
+        async def agenerate(prompt):
+            await asyncio.sleep(LLM_LATENCY)
+            return AIMessage(content="stand-in answer")
+
+        self.model = RunnableLambda(lambda prompt: AIMessage(content="stand-in answer"), afunc=agenerate)
+
+
+class StandInKeyManager:
+    def __init__(self):
+        self.key = StandInKey()
+
+    def acquire(self, tokens=0):
+        return self.key
+
+    async def aacquire(self, tokens=0):
+        return self.key
+
+    def backoff(self, attempt):
+        return 0.0
+
+    def stats(self):
+        return []
+
+
+class StandInEmbedder:
+    async def aembed(self, text):
+        await asyncio.sleep(EMBED_LATENCY)
+        return [0.0] * 8
+
+    async def aembed_queries(self, texts):
+        await asyncio.sleep(EMBED_LATENCY)
+        return [[0.0] * 8 for _ in texts]
+
+    async def aclose(self):
+        pass
+
+
+class StandInCache:
+    async def aget(self, query, query_embedding=None):
+        await asyncio.sleep(VECTOR_LATENCY)
+        return None
+
+    async def aadd(self, query, parent_ids, query_embedding=None, answer=None):
+        pass
+
+    async def aclose(self):
+        pass
+
+
+class StandInRetriever:
+    async def aget(self, query, query_embedding=None):
+        await asyncio.sleep(VECTOR_LATENCY)
+        return {"matches": [
+            {"id": "child", "score": 0.9, "metadata": {"parent_id": "mess", "original_data": "\"Breakfast\""}}
+        ]}
+
+    async def aclose(self):
+        pass
+
+
+class StandInParentStore:
+    def get(self, parent_id):
+        return {"parent_id": parent_id, "title": "Mess timings", "text": "Breakfast is served from 7:30 to 9:30.",
+                "tables": []}
+
+
+@pytest.fixture
+def badal(monkeypatch):
+    # Everything not passed in stays in process
+    monkeypatch.setenv("TABLE_FAST_PATH", "false")
+    monkeypatch.setenv("SHARED_CACHE_BACKEND", "off")
+    from retrieval_pipeline import Badal
+
+    return Badal(
+        key_manager=StandInKeyManager(),
+        embedder=StandInEmbedder(),
+        cache=StandInCache(),
+        retriever=StandInRetriever(),
+        parent_store=StandInParentStore(),
+    )
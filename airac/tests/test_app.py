@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import app
+from admission import AdmissionController
+
+
+@pytest.fixture
+def client(badal, monkeypatch):
+    monkeypatch.setattr(app, "badal_pipeline", badal)
+
+    async def post(*queries):
+        # No lifespan: the pipeline is already set
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.post("/query", json={"query": query}) for query in queries))
+
+    return post
+
+
+def test_concurrent_queries_overlap(client):
+    start = time.perf_counter()
+    [response] = asyncio.run(client("warm-up query"))
+    single = time.perf_counter() - start
+    assert response.status_code == 200
+
+    n = 16
+    start = time.perf_counter()
+    responses = asyncio.run(client(*(f"query {i}" for i in range(n))))
+    elapsed = time.perf_counter() - start
+
+    assert all(r.status_code == 200 and r.json()["cache_tier"] == "retrieval" for r in responses)
+    # A blocking pipeline would take about n * single
+    assert elapsed < n * single / 4
+
+
+def test_sheds_with_503_and_retry_after(client, monkeypatch):
+    monkeypatch.setattr(app, "admission", AdmissionController(max_concurrent=1, max_queued=0, retry_after=7))
+
+    responses = asyncio.run(client("first query", "second query"))
+
+    assert sorted(r.status_code for r in responses) == [200, 503]
+    shed = next(r for r in responses if r.status_code == 503)
+    assert shed.headers["Retry-After"] == "7"
+
+
+def test_failure_returns_500(client, badal, monkeypatch):
+    async def fail(query):
+        raise RuntimeError("upstream down")
+    monkeypatch.setattr(badal, "arun", fail)
+
+    [response] = asyncio.run(client("any query"))
+
+    assert response.status_code == 500
@@ -0,0 +1,252 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+from batching import MicroBatcher
+from single_flight import SingleFlight
+from write_behind import WriteBehindCache
+
+
+# -------------------------------
+# SingleFlight
+# -------------------------------
+def test_single_flight_deduplicates_concurrent_calls():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"deduplicated": 4, "in_flight": 0}
+
+
+def test_single_flight_shares_exceptions():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
+
+
+def test_single_flight_survives_one_caller_cancelling():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight()
+        leaving = asyncio.ensure_future(flight.do("key", fetch))
+        staying = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        return await staying
+
+    assert asyncio.run(main()) == "answer"
+
+
+def test_single_flight_cancels_once_every_caller_has_gone():
+    async def main():
+        done = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                done.set()
+                raise
+
+        flight = SingleFlight()
+        callers = [asyncio.ensure_future(flight.do("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(done.wait(), 1)
+        return flight
+
+    assert asyncio.run(main()).stats()["in_flight"] == 0
+
+
+# -------------------------------
+# MicroBatcher
+# -------------------------------
+def test_micro_batcher_coalesces_concurrent_items():
+    batches = []
+
+    async def handler(items):
+        batches.append(items)
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(handler, max_batch_size=32, max_wait_ms=5)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+    assert asyncio.run(main()) == [i * 2 for i in range(10)]
+    assert batches == [list(range(10))]
+
+
+def test_micro_batcher_skips_cancelled_callers():
+    batches = []
+
+    async def handler(items):
+        batches.append(items)
+        return items
+
+    async def main():
+        batcher = MicroBatcher(handler, max_batch_size=32, max_wait_ms=20)
+        kept = asyncio.ensure_future(batcher.submit("kept"))
+        withdrawn = asyncio.ensure_future(batcher.submit("withdrawn"))
+        await asyncio.sleep(0)
+        withdrawn.cancel()
+        return await kept
+
+    assert asyncio.run(main()) == "kept"
+    assert batches == [["kept"]]
+
+
+def test_micro_batcher_fails_every_caller_with_the_batch():
+    async def handler(items):
+        raise ConnectionError("index down")
+
+    async def main():
+        batcher = MicroBatcher(handler, max_wait_ms=1)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(main()))
+
+
+def test_micro_batcher_keeps_batch_spans_out_of_request_timings():
+    from metrics import request_timings, span
+
+    async def handler(items):
+        with span("index.search"):
+            return items
+
+    async def main():
+        batcher = MicroBatcher(handler, max_wait_ms=1)
+        timings = []
+        request_timings.set(timings)
+        await batcher.submit("query")
+        return timings
+
+    assert asyncio.run(main()) == []
+
+
+# -------------------------------
+# WriteBehindCache
+# -------------------------------
+class RecordingCache:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+        self.closed = False
+
+    async def aadd_batch(self, entries):
+        await asyncio.sleep(0.01)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("upsert failed")
+        self.batches.append([(entry["query"], entry["answer"]) for entry in entries])
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_write_behind_flushes_everything_on_close():
+    cache = RecordingCache()
+
+    async def main():
+        writer = WriteBehindCache(cache, batch_size=2)
+        for query in "abcde":
+            await writer.aadd(query, ["parent"], [0.0], f"answer {query}")
+        await writer.aclose()
+        return writer
+
+    writer = asyncio.run(main())
+    assert sorted(query for batch in cache.batches for query, _ in batch) == list("abcde")
+    assert all(len(batch) <= 2 for batch in cache.batches)
+    assert cache.closed
+    assert writer.stats()["pending"] == 0
+
+
+def test_write_behind_coalesces_and_keeps_the_latest_answer():
+    cache = RecordingCache()
+
+    async def main():
+        writer = WriteBehindCache(cache)
+        await writer.aadd("q", ["parent"], [0.0], "old")
+        await writer.aadd("q", ["parent"], [0.0], "new")
+        await writer.aclose()
+        return writer
+
+    writer = asyncio.run(main())
+    assert cache.batches == [[("q", "new")]]
+    assert writer.stats()["coalesced"] == 1
+
+
+def test_write_behind_drops_beyond_max_pending():
+    cache = RecordingCache()
+
+    async def main():
+        writer = WriteBehindCache(cache, max_pending=2)
+        for query in "abc":
+            await writer.aadd(query, ["parent"], [0.0], query)
+        await writer.aclose()
+        return writer
+
+    assert asyncio.run(main()).stats()["dropped"] == 1
+
+
+def test_write_behind_retries_a_failed_batch():
+    cache = RecordingCache(failures=1)
+
+    async def main():
+        writer = WriteBehindCache(cache, retry_delay=0)
+        await writer.aadd("q", ["parent"], [0.0], "answer")
+        await writer.aclose()
+        return writer
+
+    writer = asyncio.run(main())
+    assert cache.batches == [[("q", "answer")]]
+    assert writer.stats()["failures"] == 1
+
+
+# -------------------------------
+# AdmissionController
+# -------------------------------
+def test_admission_rejects_once_slots_and_queue_are_full():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queued=0)
+        await admission.acquire()
+        with pytest.raises(Overloaded) as rejected:
+            await admission.acquire()
+        admission.release()
+        await admission.acquire()
+        return rejected.value
+
+    assert asyncio.run(main()).reason == "queue_full"
+
+
+def test_admission_times_out_queued_requests():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queued=1, queue_timeout=0.01)
+        await admission.acquire()
+        with pytest.raises(Overloaded) as rejected:
+            await admission.acquire()
+        return rejected.value
+
+    assert asyncio.run(main()).reason == "queue_timeout"
+
@@ -0,0 +1,38 @@
+import os
+
+import parent_store
+from jsonl import write_jsonl
+
+
+def parent(parent_id):
+    return {"parent_id": parent_id, "source": "Website", "title": parent_id, "text": "text", "tables": []}
+
+
+def test_builds_on_first_use(tmp_path):
+    parents_path, path = str(tmp_path / "parent.jsonl"), str(tmp_path / "parents.db")
+    write_jsonl(parents_path, [parent("a")])
+
+    assert parent_store.ParentStore(path, parents_path).get("a")["title"] == "a"
+
+
+def test_rebuilds_when_parents_are_rechunked(tmp_path):
+    parents_path, path = str(tmp_path / "parent.jsonl"), str(tmp_path / "parents.db")
+    write_jsonl(parents_path, [parent("old")])
+    parent_store.ParentStore(path, parents_path).close()
+
+    # Re-chunking writes new IDs after the store was built
+    write_jsonl(parents_path, [parent("new")])
+    built = os.path.getmtime(path)
+    os.utime(parents_path, (built + 1, built + 1))
+
+    store = parent_store.ParentStore(path, parents_path)
+    assert store.get("new") is not None
+    assert store.get("old") is None
+
+
+def test_keeps_a_store_newer_than_its_parents(tmp_path):
+    parents_path, path = str(tmp_path / "parent.jsonl"), str(tmp_path / "parents.db")
+    write_jsonl(parents_path, [parent("a")])
+    parent_store.ParentStore(path, parents_path).close()
+
+    assert not parent_store.is_stale(path, parents_path)
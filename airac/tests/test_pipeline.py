@@ -0,0 +1,14 @@
+import asyncio
+
+
+def test_batch_returns_each_query_in_its_own_spelling(badal):
+    queries = ["Mess timings?", "mess   TIMINGS?", "Hostel fees?"]
+
+    async def main():
+        results = [result async for result in badal.abatch(queries)]
+        await badal.aclose()
+        return results
+
+    results = asyncio.run(main())
+    assert [result["query"] for result in results] == queries
+    assert all(result["answer"] == "stand-in answer" for result in results)
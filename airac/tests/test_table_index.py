@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from jsonl import read_jsonl
+from table_index import TableIndex
+
+PARENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "json_data", "parent.jsonl")
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TableIndex(read_jsonl(PARENTS_PATH))
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What are the mess timings for breakfast?", "7:30 AM - 9:00 AM"),
+    ("Who is the admission in-charge?", "Dr. Khushboo Jain"),
+    ("Who is the hostel warden for girls?", "Dr. Snehal Shinde"),
+    ("What is the IFSC code?", "SBIN0006702"),
+    # "bank" also occurs in the Information cell of this row
+    ("What is the name of the bank?", "State Bank of India"),
+])
+def test_answers_single_row_and_column(index, query, expected):
+    match = index.lookup(query)
+    assert match is not None
+    assert expected in match["answer"]
+
+
+@pytest.mark.parametrize("query", [
+    # Only part of "Name of the Bank Account" is named
+    "Which bank is the account in?",
+    # Negation and time
+    "Who was the previous admission in-charge?",
+    "What are the mess timings for breakfast on Sunday?",
+    "mess timings on holidays for lunch",
+    "Who is not the hostel warden for girls?",
+    # "canteen" is not in the table
+    "Dinner timings in the canteen",
+])
+def test_falls_through_to_the_llm(index, query):
+    assert index.lookup(query) is None